@@ -27,6 +27,37 @@ REPORTS_DIR=$PERF_BASE_DIR/reports
 $JMETER_DIR/bin/jmeter.sh -n -l samples.log -q $PROPERTIES_DIR/perftest.properties -t $KEYSTONE_TESTPLAN
 $JMETER_DIR/bin/jmeter.sh -n -l samples.log -q $PROPERTIES_DIR/perftest.properties -t $NETWORKS_TESTPLAN
 
+# Start the resident perf analyzer which analyzes the Servers API requests
+
+NOVA_LOG_PATH=`grep '^nova_log_path=' $PROPERTIES_DIR/perftest.properties | cut -d= -f2`
+ANALYZER_PORT=`grep '^analyzer_port=' $PROPERTIES_DIR/perftest.properties | cut -d= -f2`
+(cd $SCRIPTS_DIR && exec python nova_api_perf_analyzer_daemon.py -l $NOVA_LOG_PATH -i -p $ANALYZER_PORT) &
+ANALYZER_PID=$!
+
+# Wait till the perf analyzer listens, the requests would not be analyzed
+# otherwise (Eg: the port is taken)
+ANALYZER_UP=0
+for i in `seq 1 30`; do
+    # the analyzer exits when it fails to listen, another process may hold
+    # the port
+    sleep 1
+    if ! kill -0 $ANALYZER_PID 2>/dev/null; then
+        break
+    fi
+    if python -c "import socket; socket.create_connection(('127.0.0.1', $ANALYZER_PORT), 1)" 2>/dev/null; then
+        kill -0 $ANALYZER_PID 2>/dev/null && ANALYZER_UP=1
+        break
+    fi
+done
+if [ $ANALYZER_UP -eq 0 ]; then
+    echo "The perf analyzer did not start listening on port $ANALYZER_PORT"
+    kill $ANALYZER_PID 2>/dev/null
+    exit 1
+fi
+
 # Run Servers Testplan
 $JMETER_DIR/bin/jmeter.sh -n -l samples.log -q $PROPERTIES_DIR/perftest.properties -t $SERVERS_TESTPLAN
 
+# Stop the perf analyzer, the test plan waits till it has analyzed all requests
+kill $ANALYZER_PID
+
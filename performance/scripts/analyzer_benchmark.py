@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks of the Nova API performance analyzer hot paths.
+
+Usage:
+python analyzer_benchmark.py <benchmark> <api_name> <request_id>
+[-l <log_filename>] [-n <repeat>]
+
+benchmark:
+patterns: matching cost of each task log message over the request logs,
+          formatting and searching the pattern on every line (before) versus
+          the precompiled task pattern catalog (after).
+tasks:    matching cost of all the tasks of the request, rescanning the logs
+          from the previous match for every task (before) versus the
+          utils.TaskMatcher (after).
+timestamps: parsing cost of the timestamps of the request logs with
+          datetime.strptime (before) versus utils.parse_log_timestamp (after).
+"""
+import re
+import sys
+import time
+import nova_api_perf_analyzer
+from datetime import datetime
+import utils
+from optparse import OptionParser
+
+
+def _time_ms(func, repeat):
+    """Return the average time in ms taken by a call of func."""
+    start = time.time()
+    for i in xrange(repeat):
+        func()
+    return (time.time() - start) * 1E3 / repeat
+
+
+def benchmark_task_patterns(api, request_logs, repeat):
+    """Return the list of (task, before ms, after ms) for the API tasks."""
+    date_regex = nova_api_perf_analyzer.DATETIME_REGEX
+    task_patterns = nova_api_perf_analyzer.APIS[api].task_patterns
+    results = []
+    for task, log_msg, pattern, literal in task_patterns:
+        def before():
+            for line in request_logs:
+                re.search(log_msg % date_regex, line)
+
+        def after():
+            for line in request_logs:
+                pattern.search(line)
+        results.append((task, _time_ms(before, repeat),
+                        _time_ms(after, repeat)))
+    return results
+
+
+def benchmark_task_matching(api, request_logs, repeat):
+    """Return the [('tasks', before ms, after ms)] for the API tasks."""
+    task_patterns = nova_api_perf_analyzer.APIS[api].task_patterns
+
+    def before():
+        start_index = 0
+        for task, log_msg, pattern, literal in task_patterns:
+            for index in range(start_index, len(request_logs)):
+                if pattern.search(request_logs[index]):
+                    start_index = index
+                    break
+
+    def after():
+        start_index = 0
+        matcher = utils.TaskMatcher(request_logs)
+        for task, log_msg, pattern, literal in task_patterns:
+            index, mObj = matcher.search(pattern, literal, start_index)
+            if mObj:
+                start_index = index
+    return [('tasks', _time_ms(before, repeat), _time_ms(after, repeat))]
+
+
+def benchmark_timestamps(api, request_logs, repeat):
+    """Return the [('timestamps', before ms, after ms)] for the request."""
+    date_pattern = re.compile(nova_api_perf_analyzer.DATETIME_REGEX)
+    date_format = nova_api_perf_analyzer.DATE_FORMAT
+    timestamps = []
+    for line in request_logs:
+        mObj = date_pattern.search(line)
+        if mObj:
+            timestamps.append(mObj.group('date_time'))
+
+    def before():
+        for timestamp in timestamps:
+            datetime.strptime(timestamp, date_format)
+
+    def after():
+        for timestamp in timestamps:
+            utils.parse_log_timestamp(timestamp)
+    return [('timestamps', _time_ms(before, repeat),
+             _time_ms(after, repeat))]
+
+
+BENCHMARKS = {
+    'patterns': benchmark_task_patterns,
+    'tasks': benchmark_task_matching,
+    'timestamps': benchmark_timestamps}
+
+
+def print_results(header, results):
+    print "%-24s %12s %12s" % header
+    for name, before, after in results:
+        print "%-24s %12.4f %12.4f" % (name, before, after)
+    print "%-24s %12.4f %12.4f" % ('total',
+                                   sum([result[1] for result in results]),
+                                   sum([result[2] for result in results]))
+
+
+def create_options(parser):
+    """Set up the options that may be parsed as program commands."""
+    parser.add_option('-l', '--log_name', default="/var/log/syslog",
+                      action="store", help="Nova service log file path")
+    parser.add_option('-n', '--repeat', default=100, type="int",
+                      action="store", help="Number of timed repetitions")
+
+
+def main():
+    oparser = OptionParser()
+    create_options(oparser)
+    (options, args) = oparser.parse_args(sys.argv[1:])
+    if len(args) < 3 or args[0] not in BENCHMARKS:
+        print __doc__
+        sys.exit(0)
+
+    benchmark, api, request_id = args[0], args[1], args[2]
+    if api not in nova_api_perf_analyzer.APIS:
+        print _("Unknown API %s") % api
+        sys.exit(0)
+    request_logs = utils.CustomLogParser(options.log_name).\
+                        fetch_request_logs(request_id)
+    if not request_logs:
+        print _("Request-id '%s' logs not available") % request_id
+        sys.exit(1)
+    print _("Benchmark '%(benchmark)s' over %(count)d log lines, ms per "
+            "request") % {'benchmark': benchmark, 'count': len(request_logs)}
+    print_results(('name', 'before', 'after'),
+                  BENCHMARKS[benchmark](api, request_logs, options.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Chart backends of the report graphs.
+
+svg, the default, writes the dot line charts as SVG files in pure python.
+cairo renders them to PNG files with cairoplot, which is imported only when a
+chart is rendered. Series longer than the plot width in pixels are
+downsampled by the svg backend with the Largest Triangle Three Buckets
+algorithm, which keeps the peaks and dips of the series.
+
+The charts of a report are independent, render_charts renders them in a
+pool of worker processes.
+"""
+import math
+import multiprocessing
+from cgi import escape
+
+
+#series colors of the svg charts.
+COLORS = ['#c00000', '#0060c0', '#00a040', '#e08000', '#8040c0', '#00a0a0',
+          '#806040', '#c040a0', '#606060', '#a0a000']
+
+FONT = "font-family:Verdana,sans-serif"
+
+#the svg charts have dots only up to this number of points per series.
+MAX_DOTS = 100
+
+
+def downsample(points, threshold):
+    """
+    Return threshold points of the list of (x, y) points, picked with the
+    Largest Triangle Three Buckets algorithm. The first and last points are
+    kept, the points between them are split in threshold - 2 buckets and the
+    point of each bucket making the largest triangle with the previous picked
+    point and the average point of the next bucket is picked.
+    """
+    if threshold < 3 or len(points) <= threshold:
+        return points
+    sampled = [points[0]]
+    every = float(len(points) - 2) / (threshold - 2)
+    previous = 0
+    for bucket in xrange(threshold - 2):
+        start = int((bucket + 1) * every) + 1
+        end = min(int((bucket + 2) * every) + 1, len(points))
+        next_points = points[start:max(end, start + 1)]
+        avg_x = sum([x for x, y in next_points]) / float(len(next_points))
+        avg_y = sum([y for x, y in next_points]) / float(len(next_points))
+
+        prev_x, prev_y = points[previous]
+        max_area = -1
+        for index in xrange(int(bucket * every) + 1, start):
+            x, y = points[index]
+            area = abs((prev_x - avg_x) * (y - prev_y) -
+                       (prev_x - x) * (avg_y - prev_y))
+            if area > max_area:
+                max_area = area
+                picked = index
+        sampled.append(points[picked])
+        previous = picked
+    sampled.append(points[-1])
+    return sampled
+
+
+def _to_number(value):
+    """Return the float of a series value, None if the value is missing."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value != value:
+        return None
+    return value
+
+
+def _tick_step(max_value, ticks=5):
+    """Return a round (1, 2 or 5 x 10^n) step of the y axis."""
+    raw_step = max_value / float(ticks)
+    magnitude = 10 ** math.floor(math.log10(raw_step))
+    for factor in (1, 2, 5, 10):
+        if raw_step <= factor * magnitude:
+            return factor * magnitude
+    return 10 * magnitude
+
+
+def _format_tick(value):
+    if value == int(value):
+        return str(int(value))
+    return '%g' % value
+
+
+class ChartBackend(object):
+    """Renders the dot line charts of the reports to files."""
+
+    #extension of the chart files.
+    extension = None
+
+    def dot_line_plot(self, fname, data, width, height, x_labels=None,
+                      x_title=None, y_title=None):
+        """
+        Render the {series name: list of values} as lines of dots, a value
+        which is not a number (eg. '-') is missing.
+        """
+        raise NotImplementedError()
+
+
+class CairoChartBackend(ChartBackend):
+    """PNG charts, rendered by cairoplot."""
+
+    extension = 'png'
+
+    def dot_line_plot(self, fname, data, width, height, x_labels=None,
+                      x_title=None, y_title=None):
+        import cairoplot
+        cairoplot.dot_line_plot(fname, data, width, height, axis=True,
+                                series_legend=True, y_title=y_title,
+                                x_title=x_title, x_labels=x_labels)
+
+
+class SVGChartBackend(ChartBackend):
+    """SVG charts, written without any dependency."""
+
+    extension = 'svg'
+
+    LEFT = 70
+    RIGHT = 170
+    TOP = 20
+    BOTTOM = 100
+
+    def _series_runs(self, values):
+        """
+        Return the runs of consecutive (index, value) points of the series,
+        split at the missing values.
+        """
+        runs = [[]]
+        for index, value in enumerate(values):
+            value = _to_number(value)
+            if value is None:
+                if runs[-1]:
+                    runs.append([])
+                continue
+            runs[-1].append((index, value))
+        return [run for run in runs if run]
+
+    def dot_line_plot(self, fname, data, width, height, x_labels=None,
+                      x_title=None, y_title=None):
+        plot_width = width - self.LEFT - self.RIGHT
+        plot_height = height - self.TOP - self.BOTTOM
+        names = sorted(data)
+        series = {}
+        point_count = len(x_labels or [])
+        max_value = 0
+        for name in names:
+            values = list(data[name])
+            point_count = max(point_count, len(values))
+            runs = self._series_runs(values)
+            #keep about one point per pixel of the plot.
+            series[name] = [downsample(run, max(3, plot_width * len(run) /
+                                                   max(len(values), 1)))
+                            for run in runs]
+            for run in runs:
+                max_value = max(max_value, max([y for x, y in run]))
+
+        step = _tick_step(max_value) if max_value > 0 else 1
+        y_max = step * math.ceil(max_value / step) if max_value > 0 else 5
+
+        def x_pos(index):
+            if point_count < 2:
+                return self.LEFT + plot_width / 2.0
+            return self.LEFT + index * plot_width / float(point_count - 1)
+
+        def y_pos(value):
+            return self.TOP + plot_height - value * plot_height / y_max
+
+        out = ['<svg xmlns="http://www.w3.org/2000/svg" width="%d" '
+               'height="%d" viewBox="0 0 %d %d">' % (width, height, width,
+                                                     height),
+               '<rect width="100%" height="100%" fill="white"/>']
+        #y axis grid and ticks.
+        tick = 0
+        while tick <= y_max + step / 2.0:
+            y = y_pos(tick)
+            out.append('<line x1="%d" y1="%.1f" x2="%d" y2="%.1f" '
+                       'stroke="#e0e0e0"/>' % (self.LEFT, y,
+                                               self.LEFT + plot_width, y))
+            out.append('<text x="%d" y="%.1f" text-anchor="end" '
+                       'font-size="10" style="%s">%s</text>' %
+                       (self.LEFT - 5, y + 3, FONT, _format_tick(tick)))
+            tick += step
+        out.append('<polyline points="%d,%d %d,%d %d,%d" fill="none" '
+                   'stroke="black"/>' % (self.LEFT, self.TOP, self.LEFT,
+                                         self.TOP + plot_height,
+                                         self.LEFT + plot_width,
+                                         self.TOP + plot_height))
+
+        #x labels, at most one per 20 pixels.
+        labels = x_labels or []
+        label_step = int(math.ceil(len(labels) * 20.0 / plot_width)) or 1
+        for index in xrange(0, len(labels), label_step):
+            x = x_pos(index)
+            y = self.TOP + plot_height + 12
+            out.append('<text x="%.1f" y="%d" text-anchor="end" '
+                       'font-size="10" style="%s" transform="rotate(-30 '
+                       '%.1f %d)">%s</text>' % (x, y, FONT, x, y,
+                                                escape(str(labels[index]))))
+        if x_title:
+            out.append('<text x="%.1f" y="%d" text-anchor="middle" '
+                       'font-size="12" style="%s">%s</text>' %
+                       (self.LEFT + plot_width / 2.0, height - 10, FONT,
+                        escape(x_title)))
+        if y_title:
+            y = self.TOP + plot_height / 2.0
+            out.append('<text x="15" y="%.1f" text-anchor="middle" '
+                       'font-size="12" style="%s" transform="rotate(-90 15 '
+                       '%.1f)">%s</text>' % (y, FONT, y, escape(y_title)))
+
+        for number, name in enumerate(names):
+            color = COLORS[number % len(COLORS)]
+            for run in series[name]:
+                points = ' '.join(['%.1f,%.1f' % (x_pos(x), y_pos(y))
+                                   for x, y in run])
+                out.append('<polyline points="%s" fill="none" stroke="%s" '
+                           'stroke-width="2"/>' % (points, color))
+                if len(run) <= MAX_DOTS:
+                    out.extend(['<circle cx="%.1f" cy="%.1f" r="3" '
+                                'fill="%s"/>' % (x_pos(x), y_pos(y), color)
+                                for x, y in run])
+            #series legend.
+            y = self.TOP + 10 + number * 18
+            out.append('<rect x="%d" y="%d" width="10" height="10" '
+                       'fill="%s"/>' % (width - self.RIGHT + 15, y - 9,
+                                        color))
+            out.append('<text x="%d" y="%d" font-size="11" style="%s">%s'
+                       '</text>' % (width - self.RIGHT + 30, y, FONT,
+                                    escape(str(name))))
+        out.append('</svg>\n')
+
+        fp = open(fname, 'w')
+        fp.write('\n'.join(out))
+        fp.close()
+
+
+chart_backends = {'svg': SVGChartBackend, 'cairo': CairoChartBackend}
+
+
+def get_backend(name='svg'):
+    """Return the chart backend of the name, svg or cairo."""
+    if name not in chart_backends:
+        raise ValueError("Unknown chart backend '%s', choose one of %s" %
+                         (name, ', '.join(sorted(chart_backends))))
+    return chart_backends[name]()
+
+
+def _render_chart(args):
+    backend_name, fname, data, width, height, kwargs = args
+    get_backend(backend_name).dot_line_plot(fname, data, width, height,
+                                            **kwargs)
+
+
+def render_charts(backend_name, charts, workers=None):
+    """
+    Render the charts, a list of (fname, data, width, height, kwargs of
+    dot_line_plot), up to workers (default: number of cores) at a time.
+    """
+    jobs = [(backend_name, ) + tuple(chart) for chart in charts]
+    if workers == 1 or len(jobs) < 2:
+        map(_render_chart, jobs)
+        return
+    pool = multiprocessing.Pool(min(workers or multiprocessing.cpu_count(),
+                                    len(jobs)))
+    try:
+        pool.map(_render_chart, jobs)
+    finally:
+        pool.close()
+        pool.join()
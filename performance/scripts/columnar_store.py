@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+"""
+Compact columnar store of the analysis results and the JMeter samples.
+
+A file is a sequence of row groups, each one appended at once by a writer:
+
+    MAGIC | header length (uint32) | header (json) | column blocks
+
+The header is the schema of the row group, the row count and the name, type
+(int64, float64 or str), codec (raw or zlib) and block length of each column.
+Numbers are stored as little endian typed arrays, missing numbers as NaN in
+float64 columns. Each column is compressed only when it pays off. The blocks
+are 8 byte aligned, so the raw numeric blocks are read in place from the
+memory-mapped file.
+
+Usage:
+python columnar_store.py export <columnar_file> [<csv_file>]
+python columnar_store.py import <csv_file> <columnar_file>
+
+import converts a results csv or a csv jtl, the numeric columns are typed.
+"""
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+
+MAGIC = 'NVCOL01\n'
+
+HEADER_LENGTH = struct.Struct('<I')
+
+ALIGNMENT = 8
+
+#a column is stored compressed when it shrinks at least to this fraction.
+COMPRESSION_RATIO = 0.9
+
+#typecodes of the 64 bit array types.
+TYPECODES = {'int64': 'l', 'float64': 'd'}
+
+NAN = float('nan')
+
+
+class ColumnarFormatError(Exception):
+    """Raised when a file is not in the columnar format."""
+    pass
+
+
+def is_columnar_file(filename):
+    """Return True if the file starts with a columnar row group."""
+    fp = open(filename, 'rb')
+    try:
+        return fp.read(len(MAGIC)) == MAGIC
+    finally:
+        fp.close()
+
+
+def _fetch_column_type(values):
+    column_type = 'int64'
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value,
+                                                     (int, long, float)):
+            if value is not None:
+                return 'str'
+            column_type = 'float64'
+        elif isinstance(value, float):
+            column_type = 'float64'
+    return column_type
+
+
+def _encode_numbers(column_type, values):
+    if column_type == 'float64':
+        values = [NAN if value is None else value for value in values]
+    data = array(TYPECODES[column_type], values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tostring()
+
+
+def _encode_strings(values):
+    return json.dumps([value if value is None or isinstance(value, unicode)
+                       else str(value).decode('utf-8') for value in values],
+                      separators=(',', ':'))
+
+
+def encode_row_group(fields, rows):
+    """
+    Return the row group of the rows, lists of values ordered as the fields.
+    """
+    columns = []
+    blocks = []
+    for index, field in enumerate(fields):
+        values = [row[index] for row in rows]
+        column_type = _fetch_column_type(values)
+        if column_type == 'str':
+            block = _encode_strings(values)
+        else:
+            block = _encode_numbers(column_type, values)
+        codec = 'raw'
+        compressed = zlib.compress(block, 1)
+        if len(compressed) <= len(block) * COMPRESSION_RATIO:
+            block = compressed
+            codec = 'zlib'
+        columns.append({'name': field, 'type': column_type, 'codec': codec,
+                        'length': len(block)})
+        blocks.append(block + '\0' * (-len(block) % ALIGNMENT))
+
+    header = json.dumps({'rows': len(rows), 'columns': columns},
+                        separators=(',', ':'))
+    #pad the header so the first block is aligned.
+    header += ' ' * (-(len(MAGIC) + HEADER_LENGTH.size + len(header)) %
+                     ALIGNMENT)
+    return MAGIC + HEADER_LENGTH.pack(len(header)) + header + ''.join(blocks)
+
+
+class RowGroup(object):
+    """The schema and the column block offsets of a row group."""
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        #{field: (type, codec, offset, length)}
+        self.columns = columns
+
+
+class ColumnarReader(object):
+    """
+    Reads the columns of a columnar file through a memory mapping of the
+    file, only the blocks of the requested columns are decoded.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.fp = open(filename, 'rb')
+        self.mapped = None
+        self.row_groups = []
+        self.fields = []
+        size = os.fstat(self.fp.fileno()).st_size
+        if size:
+            self.mapped = mmap.mmap(self.fp.fileno(), size,
+                                    access=mmap.ACCESS_READ)
+            self._read_row_groups()
+
+    def _read_row_groups(self):
+        mapped = self.mapped
+        size = len(mapped)
+        offset = 0
+        while offset < size:
+            start = offset + len(MAGIC) + HEADER_LENGTH.size
+            if start > size:
+                break
+            if mapped[offset:offset + len(MAGIC)] != MAGIC:
+                raise ColumnarFormatError("%s: no row group at offset %d" %
+                                          (self.filename, offset))
+            header_length = HEADER_LENGTH.unpack(
+                                mapped[start - HEADER_LENGTH.size:start])[0]
+            offset = start + header_length
+            if offset > size:
+                break
+            header = json.loads(mapped[start:offset])
+            columns = {}
+            for column in header['columns']:
+                columns[column['name']] = (column['type'], column['codec'],
+                                           offset, column['length'])
+                if column['name'] not in self.fields:
+                    self.fields.append(column['name'])
+                offset += column['length'] + (-column['length'] % ALIGNMENT)
+            #a writer may still be appending the last row group.
+            if offset > size:
+                break
+            self.row_groups.append(RowGroup(header['rows'], columns))
+
+    @property
+    def rows(self):
+        return sum([row_group.rows for row_group in self.row_groups])
+
+    def column_blocks(self, field):
+        """
+        Return the list of (type, data) of the column in each row group.
+        The data of a numeric column is a buffer of little endian values,
+        referencing the mapped file when the column is not compressed. The
+        data of a str column is a list. A column missing in a row group is a
+        float64 None.
+        """
+        blocks = []
+        for row_group in self.row_groups:
+            if field not in row_group.columns:
+                blocks.append(('float64', None))
+                continue
+            column_type, codec, offset, length = row_group.columns[field]
+            data = buffer(self.mapped, offset, length)
+            if codec == 'zlib':
+                data = zlib.decompress(data)
+            if column_type == 'str':
+                data = json.loads(str(data))
+            blocks.append((column_type, data))
+        return blocks
+
+    def column(self, field):
+        """
+        Return the values of the column, an array of the numeric columns or a
+        list if the column has str values.
+        """
+        blocks = self.column_blocks(field)
+        types = set([column_type for column_type, data in blocks])
+        if 'str' in types:
+            values = []
+            for row_group, (column_type, data) in zip(self.row_groups,
+                                                      blocks):
+                if column_type == 'str':
+                    values.extend(data)
+                else:
+                    values.extend(self._decode_numbers(column_type, data,
+                                                       row_group.rows))
+            return values
+        column_type = 'float64' if 'float64' in types else 'int64'
+        if array(TYPECODES['int64']).itemsize != 8:
+            column_type = 'float64'
+        values = array(TYPECODES[column_type])
+        for row_group, (block_type, data) in zip(self.row_groups, blocks):
+            block_values = self._decode_numbers(block_type, data,
+                                                row_group.rows)
+            if block_values.typecode != values.typecode:
+                #int64 row groups of a float64 column.
+                block_values = array(values.typecode, block_values)
+            values.extend(block_values)
+        return values
+
+    def _decode_numbers(self, column_type, data, rows):
+        if data is None:
+            return array('d', [NAN]) * rows
+        values = array(TYPECODES[column_type])
+        if values.itemsize != 8:
+            #long is 32 bit on this platform.
+            return array('d', struct.unpack('<%dq' % rows, str(data)))
+        values.fromstring(data)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        return values
+
+    def iter_rows(self):
+        """Return an iterator over the rows, dicts of field values."""
+        columns = [self.column(field) for field in self.fields]
+        for values in zip(*columns):
+            yield dict(zip(self.fields, values))
+
+    def export_csv(self, fp):
+        """Write the rows to the csv file object, with the field names."""
+        writer = csv.writer(fp)
+        writer.writerow(self.fields)
+        columns = [self.column(field) for field in self.fields]
+        for values in zip(*columns):
+            writer.writerow([format_csv_value(value) for value in values])
+
+    def close(self):
+        if self.mapped is not None:
+            self.mapped.close()
+        self.fp.close()
+
+
+def format_csv_value(value):
+    if value is None or value != value:
+        return ''
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _parse_csv_value(value):
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    if value == '':
+        return None
+    return value
+
+
+def export_csv(filename, csv_filename):
+    """Write the columnar file to a csv file."""
+    reader = ColumnarReader(filename)
+    fp = open(csv_filename, 'wb')
+    try:
+        reader.export_csv(fp)
+    finally:
+        fp.close()
+        reader.close()
+
+
+def import_csv(csv_filename, filename, row_group_size=100000):
+    """Write the csv file, with the field names, to a columnar file."""
+    fp = open(csv_filename, 'rb')
+    out = open(filename, 'wb')
+    try:
+        csv_iter = csv.reader(fp)
+        fields = csv_iter.next()
+        rows = []
+        for row in csv_iter:
+            rows.append([_parse_csv_value(value) for value in row])
+            if len(rows) == row_group_size:
+                out.write(encode_row_group(fields, rows))
+                rows = []
+        if rows:
+            out.write(encode_row_group(fields, rows))
+    finally:
+        out.close()
+        fp.close()
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('export', 'import'):
+        print __doc__
+        sys.exit(0)
+    if sys.argv[1] == 'export':
+        if len(sys.argv) > 3:
+            export_csv(sys.argv[2], sys.argv[3])
+        else:
+            reader = ColumnarReader(sys.argv[2])
+            reader.export_csv(sys.stdout)
+            reader.close()
+    else:
+        if len(sys.argv) < 4:
+            print __doc__
+            sys.exit(0)
+        import_csv(sys.argv[2], sys.argv[3])
+
+
+if __name__ == '__main__':
+    main()
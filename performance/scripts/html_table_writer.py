@@ -0,0 +1,105 @@
+"""
+Writes the tabular HTML reports straight to the report files.
+
+The rows are escaped and written as they are read, ROWS_PER_PAGE rows per
+page file, so large csv files are reported with a flat memory use. The pages
+after the first one are <report>_tabular_<page number>.html, each page links
+to the previous and the next one.
+"""
+from cgi import escape
+from os import path
+
+
+#rows of the table in each page file.
+ROWS_PER_PAGE = 10000
+
+PAGE_HEADER = "<!DOCTYPE HTML PUBLIC '-//W3C//DTD HTML 4.01 "\
+              "Transitional//EN'>\n<html lang=\"en\">\n<head>\n"\
+              "<title>%(title)s</title>\n</head>\n<body>\n"\
+              "<h1 style=\"%(h1_style)s\">%(heading)s</h1>\n<hr />\n"
+
+TABLE_HEADER = "<table border=\"2\" cellspacing=\"0\" cellpadding=\"4\" "\
+               "width=\"50%%\" style=\"%(table_style)s\">\n"
+
+PAGE_FOOTER = "</body>\n</html>"
+
+LINK = "<a href=\"%(href)s\" style=\"%(style)s\">%(text)s</a>\n"
+
+
+def _escape_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return escape(str(value))
+
+
+class TabularHTMLWriter(object):
+    """Writes a table, with its header row, to paginated HTML files."""
+
+    def __init__(self, reports_dir, report_name, h1_style, table_style,
+                 a_style, title="Jenkins", rows_per_page=ROWS_PER_PAGE):
+        self.reports_dir = reports_dir
+        self.report_name = report_name
+        self.h1_style = h1_style
+        self.table_style = table_style
+        self.a_style = a_style
+        self.title = title
+        self.rows_per_page = rows_per_page
+
+    def page_fname(self, page_number):
+        """Return the file name of the page, numbered from 1."""
+        if page_number == 1:
+            return '%s_tabular.html' % self.report_name
+        return '%s_tabular_%d.html' % (self.report_name, page_number)
+
+    def _write_link(self, fp, page_number, text):
+        fp.write(LINK % {'href': escape(self.page_fname(page_number), True),
+                         'style': self.a_style, 'text': text})
+
+    def _open_page(self, page_number, header_cells):
+        fp = open(path.join(self.reports_dir, self.page_fname(page_number)),
+                  'w')
+        heading = "Performance report - %s" % self.report_name
+        if page_number > 1:
+            heading += " (page %d)" % page_number
+        fp.write(PAGE_HEADER % {'title': escape(self.title),
+                                'h1_style': self.h1_style,
+                                'heading': escape(heading)})
+        if page_number > 1:
+            self._write_link(fp, page_number - 1, "Previous page")
+        fp.write(TABLE_HEADER % {'table_style': self.table_style})
+        fp.write(header_cells)
+        return fp
+
+    def _close_page(self, fp, page_number, has_next):
+        fp.write("</table>\n")
+        if page_number > 1:
+            self._write_link(fp, page_number - 1, "Previous page")
+        if has_next:
+            self._write_link(fp, page_number + 1, "Next page")
+        fp.write(PAGE_FOOTER)
+        fp.close()
+
+    def write(self, headers, rows):
+        """
+        Write the rows of an iterable, returns the file name of the first
+        page.
+        """
+        header_cells = ''.join(["<th>%s</th>\n" % _escape_value(header)
+                                for header in headers])
+        page_number = 1
+        fp = self._open_page(page_number, header_cells)
+        page_rows = 0
+        for row in rows:
+            if page_rows == self.rows_per_page:
+                self._close_page(fp, page_number, True)
+                page_number += 1
+                fp = self._open_page(page_number, header_cells)
+                page_rows = 0
+            fp.write("<tr>\n%s</tr>\n" % ''.join(["<td>%s</td>\n" %
+                                                  _escape_value(value)
+                                                  for value in row]))
+            page_rows += 1
+        self._close_page(fp, page_number, False)
+        return self.page_fname(1)
@@ -6,13 +6,26 @@ reports from the png and csv files.
 Input - JTL file
 Output - PNG and CSV file, HTML reports
 
+The default native engine (jtl_aggregator.py) computes the csv files in
+process, reading each JTL file once, and renders the charts from the csv files
+with a chart backend (svg by default, see chart_backends.py). The cmdrunner
+engine runs the JMeterPlugins CMD Command Line Tool for each plugin, running up
+to one conversion per core (or -w workers) at a time.
+
 REFER URL: http://code.google.com/p/jmeter-plugins/wiki/JMeterPluginsCMD
 '''
+import chart_backends
 import csv
+import html_table_writer
+import jtl_aggregator
 import markup
+import multiprocessing
 import subprocess
 import sys
 import os
+from multiprocessing.pool import ThreadPool
+from optparse import OptionParser
+from os import path, access, R_OK
 
 
 plugin_class_file_map = {'AggregateReport':'aggregate_report.jtl',
@@ -24,6 +37,27 @@ plugin_class_file_map = {'AggregateReport':'aggregate_report.jtl',
 			'ResponseTimesOverTime':'response_times_over_time.jtl',
 			'ResponseTimesPercentiles':'response_times_percentiles.jtl',
 			}
+#the test plans write all the samples once to this file, every plugin_class
+#but PerfMon (server agent metrics) is derived from it. The per plugin_class
+#.jtl files of older test runs are used when it is not found.
+raw_samples_file = 'samples.jtl'
+#the raw samples file converted to the columnar format (columnar_store.py
+#import), read instead of it by the native engine.
+columnar_samples_file = 'samples.col'
+
+#y axis titles of the charts rendered from the csv files.
+plugin_class_y_title_map = {'HitsPerSecond': 'Hits per second',
+                            'LatenciesOverTime': 'Latency (ms)',
+                            'PerfMon': 'Value',
+                            'ResponseCodesPerSecond': 'Responses per second',
+                            'ResponseTimesDistribution': 'Number of responses',
+                            'ResponseTimesOverTime': 'Response time (ms)',
+                            'ResponseTimesPercentiles': 'Response time (ms)',
+                            }
+
+CHART_WIDTH = 800
+CHART_HEIGHT = 600
+
 jar_path = '/home/rohit/jmeter/apache-jmeter-2.6/lib/ext/CMDRunner.jar'
 
 png_cmd = 'java -jar %s --tool Reporter --generate-png %s.png '\
@@ -33,14 +67,25 @@ csv_cmd = 'java -jar %s --tool Reporter --generate-csv '\
           '%s.csv --input-jtl %s --plugin-type %s'
 
 
+def run_command(cmd):
+    """Run the shell command, returns (cmd, exit code, stderr output)."""
+    process = subprocess.Popen(cmd, shell=True, stderr=subprocess.PIPE)
+    stderr = process.communicate()[1]
+    return cmd, process.returncode, stderr
+
+
 class HTMLReportGenerator:
-    def __init__(self, source_dir, reports_dir, cmd_runner=None):
+    def __init__(self, source_dir, reports_dir, cmd_runner=None,
+                 engine='native', workers=None, chart_backend='svg'):
 	if not cmd_runner:
   	    self.cmd_runner = jar_path
 	else:
             self.cmd_runner = cmd_runner 
         self.source_dir = source_dir
         self.reports_dir = reports_dir
+        self.engine = engine
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chart_backend = chart_backend
         self.h1_style = "font-family:Verdana,sans-serif; font-size:18pt; "\
                         "color:rgb(96,0,0)"
         self.h2_style = "font-family:Verdana,sans-serif; font-size:16pt; "\
@@ -49,27 +94,122 @@ class HTMLReportGenerator:
                        " font-size:8pt; margin-right: 20px"
         self.table_style = "font-family:Verdana, sans-serif; text-align:left"
 
+    def get_jtl_path(self, plugin):
+        """
+        Return the .jtl path of the plugin_class, the raw samples file when
+        it is created.
+        """
+        if plugin != 'PerfMon':
+            samples_files = [raw_samples_file]
+            if self.engine == 'native':
+                samples_files.insert(0, columnar_samples_file)
+            for samples_file in samples_files:
+                fpath = path.join(self.source_dir, samples_file)
+                if path.isfile(fpath) and access(fpath, R_OK):
+                    return fpath
+        return path.join(self.source_dir, plugin_class_file_map[plugin])
+
     def generate_png_and_csv_from_jtl(self):
         """
         Generate png and csv files for all plugin_classes whose .jtl are 
-        created.
+        created. Returns the list of (command, exit code, stderr output) of
+        the failed conversions.
         """
         if not os.listdir(self.source_dir):
             raise Exception, "No jtl files were found in %s" % self.source_dir 
-        for key,value in plugin_class_file_map.items():
-            fpath = path.join(self.source_dir, value)
+        if self.engine == 'native':
+            self.generate_csv_from_jtl()
+            self.generate_charts_from_csv()
+            return []
+        commands = []
+        for key in plugin_class_file_map.keys():
+            fpath = self.get_jtl_path(key)
             dpath = path.join(self.reports_dir, key)
             if path.exists(fpath) and path.isfile(fpath) and \
                 access(fpath, R_OK):
                 if key == 'AggregateReport':
                     # Only csv can be generated for Aggregate Report
                     csv_cmd1 = csv_cmd % (self.cmd_runner, dpath, fpath, key)
-                    subprocess.check_call("%s" % csv_cmd1, shell=True)
+                    commands.append(csv_cmd1)
                     continue
                 png_cmd1 = png_cmd % (self.cmd_runner, dpath, fpath, key)
-                subprocess.check_call ("%s" % png_cmd1, shell=True)
+                commands.append(png_cmd1)
                 csv_cmd1 = csv_cmd % (self.cmd_runner, dpath, fpath, key)
-                subprocess.check_call("%s" % csv_cmd1, shell=True)
+                commands.append(csv_cmd1)
+        return self.run_commands(commands)
+
+    def run_commands(self, commands):
+        """
+        Run the independent conversion commands, up to self.workers at a time,
+        and carry on when one fails. Returns the list of (command, exit code,
+        stderr output) of the failed commands.
+        """
+        failed = []
+        #each worker thread just waits for its java process.
+        pool = ThreadPool(self.workers)
+        try:
+            for cmd, returncode, stderr in pool.imap_unordered(run_command,
+                                                               commands):
+                if returncode != 0:
+                    print "Failed with exit code %d: %s\n%s" % (returncode,
+                                                               cmd, stderr)
+                    failed.append((cmd, returncode, stderr))
+        finally:
+            pool.close()
+            pool.join()
+        return failed
+
+    def generate_csv_from_jtl(self):
+        """
+        Generate csv files for all plugin_classes whose .jtl are created, with
+        the native engine, reading each .jtl once for all its plugin_classes.
+        """
+        plugins_by_jtl = {}
+        for key in plugin_class_file_map.keys():
+            fpath = self.get_jtl_path(key)
+            if path.exists(fpath) and path.isfile(fpath) and \
+                access(fpath, R_OK):
+                plugins_by_jtl.setdefault(fpath, []).append(key)
+        for fpath, plugins in plugins_by_jtl.items():
+            jtl_aggregator.generate_csv_reports(fpath, self.reports_dir,
+                                                plugins)
+
+    def get_chart_fname(self, plugin):
+        """Return the chart file name of the plugin_class."""
+        if self.engine == 'native':
+            extension = chart_backends.get_backend(
+                                            self.chart_backend).extension
+        else:
+            extension = 'png'
+        return "%s.%s" % (plugin, extension)
+
+    def generate_charts_from_csv(self):
+        """
+        Render the charts of the plugin_classes from their csv files, the
+        first column is the x axis and each other column a series.
+        """
+        charts = []
+        for plugin in plugin_class_y_title_map.keys():
+            csv_fname = path.join(self.reports_dir, plugin + ".csv")
+            if not path.isfile(csv_fname):
+                continue
+            fp = open(csv_fname, 'rb')
+            csv_iter = csv.reader(fp)
+            headers = csv_iter.next()
+            rows = [row for row in csv_iter if row]
+            fp.close()
+            if not rows:
+                continue
+            data = dict([(headers[index], [row[index] if index < len(row)
+                                           else '' for row in rows])
+                         for index in range(1, len(headers))])
+            charts.append((path.join(self.reports_dir,
+                                     self.get_chart_fname(plugin)),
+                           data, CHART_WIDTH, CHART_HEIGHT,
+                           {'x_labels': [row[0] for row in rows],
+                            'x_title': headers[0],
+                            'y_title': plugin_class_y_title_map[plugin]}))
+        chart_backends.render_charts(self.chart_backend, charts, self.workers)
 
     def generate_html_report(self):
         """
@@ -85,9 +225,9 @@ class HTMLReportGenerator:
             page.h2(plugin, style=self.h2_style)
             if plugin != 'AggregateReport':
                 # Aggregate Report will only have tabular report link.                
-                #png_path = path.join(self.reports_dir, plugin + ".png")
-                png_path = plugin + ".png"
-                page.img(src=png_path, alt=plugin)
+                chart_path = self.get_chart_fname(plugin)
+                if path.exists(path.join(self.reports_dir, chart_path)):
+                    page.img(src=chart_path, alt=plugin)
             page.br()
             #generate tabular report.
             report_path = self.generate_tabular_html_report_for_plugin(plugin)
@@ -105,61 +245,63 @@ class HTMLReportGenerator:
         html.close()
         print "Generated Performance Report : %s" % fpath
 
-    def _generate_table(self, page, header_list, data_iter):
-        """
-        Generate an HTML table from the provided iterator.
-        """
-        page.table(border="2", cellspacing="0", cellpadding="4", width="50%",
-                   style=self.table_style)
-        #write table headers
-        for header in header_list:
-            page.th(header)
-        #write table data rows
-        for item in data_iter:
-            page.tr()
-            for value in item:
-                page.td(value)
-            page.tr.close()
-        page.table.close()
-
     def generate_tabular_html_report_for_plugin(self, plugin_name):
         """
-        Generate the html report out of the csv files created from jtl.
+        Generate the html report out of the csv files created from jtl. The
+        rows are streamed to the report pages, see html_table_writer.py.
         """
         fname = None
         csv_fname = path.join(self.reports_dir, plugin_name + ".csv")
         if path.exists(csv_fname) and path.isfile(csv_fname) and\
            access(csv_fname, R_OK):
-            csv_iter = csv.reader(open(csv_fname, 'rb'))
+            fp = open(csv_fname, 'rb')
+            csv_iter = csv.reader(fp)
             headers = csv_iter.next()
-        
-            page = markup.page()
-            page.init(title="Jenkins")
-            page.h1("Performance report - %s" % plugin_name, style=self.h1_style)
-            page.hr()
-            self._generate_table(page, headers, csv_iter)
-
-            #write the performance report html file.
-            fname = '%s_tabular.html' % plugin_name
-            html = open(path.join(self.reports_dir, fname), 'w')
-            html.write(str(page))
-            html.close()
+            writer = html_table_writer.TabularHTMLWriter(self.reports_dir,
+                            plugin_name, self.h1_style, self.table_style,
+                            self.a_style)
+            fname = writer.write(headers, csv_iter)
+            fp.close()
         return fname
 
-
 def main():
-    if len(sys.argv) < 3:
+    oparser = OptionParser(usage="./report_generator.py source_dir dest_dir "
+                                 "<CMDRunner.jar path> [-e <engine>] "
+                                 "[-w <workers>] [-c <chart_backend>]")
+    oparser.add_option('-e', '--engine', default='native',
+                       choices=['native', 'cmdrunner'],
+                       help="Engine generating the csv files from the jtl "
+                            "files: native or cmdrunner")
+    oparser.add_option('-w', '--workers', default=None, type="int",
+                       help="Number of concurrent CMDRunner conversions "
+                            "or rendered charts, defaults to the number of "
+                            "cores")
+    oparser.add_option('-c', '--chart_backend', default='svg',
+                       choices=sorted(chart_backends.chart_backends),
+                       help="Backend rendering the charts of the native "
+                            "engine: svg or cairo (png files, needs "
+                            "cairoplot)")
+    (options, args) = oparser.parse_args(sys.argv[1:])
+    if len(args) < 2:
         print "Usage: ./report_generator.py source_dir dest_dir <CMDRunner.jar path>\n\
 	       source_dir: Path to directory containing .jtl files\n\
                dest_dir: Path to create PNG and CSV files and HTML report file\n\
-	       CMDRunner.jar path(Optional): Path to Jmeter plugin CMDRunner.jar\n"
+	       CMDRunner.jar path(Optional): Path to Jmeter plugin CMDRunner.jar\n\
+	       -e engine(Optional): native (default) or cmdrunner\n\
+	       -w workers(Optional): concurrent CMDRunner conversions\n\
+	       -c chart_backend(Optional): svg (default) or cairo\n"
         sys.exit(0)
-    cmd_runner_path = sys.argv[3] if len(sys.argv) > 3 else None
-    report_gen = HTMLReportGenerator(sys.argv[1], sys.argv[2], cmd_runner_path)
-    print "Listener JTL files are stored in %s" % sys.argv[1]
-    print "Generating PNG and CSV files in %s" % sys.argv[2]
-    report_gen.generate_png_and_csv_from_jtl()
+    cmd_runner_path = args[2] if len(args) > 2 else None
+    report_gen = HTMLReportGenerator(args[0], args[1], cmd_runner_path,
+                                     options.engine, options.workers,
+                                     options.chart_backend)
+    print "Listener JTL files are stored in %s" % args[0]
+    print "Generating PNG and CSV files in %s" % args[1]
+    failed = report_gen.generate_png_and_csv_from_jtl()
     report_gen.generate_html_report()
+    if failed:
+        print "%d of the conversions failed" % len(failed)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
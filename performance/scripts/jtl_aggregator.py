@@ -0,0 +1,484 @@
+#!/usr/bin/env python
+"""
+Aggregates the samples of JMeter result (.jtl) files into the csv reports of
+the JMeterPlugins CMD Command Line Tool, without starting a JVM.
+
+Each jtl file is streamed once and all the reports of the plugins reading it
+are computed in that pass. Both the XML and the CSV jtl formats are read, and
+the jtl files converted to the columnar format (see columnar_store.py).
+
+Usage:
+python jtl_aggregator.py <jtl_file> <dest_dir> <plugin> [<plugin> ...]
+
+plugin: AggregateReport, HitsPerSecond, LatenciesOverTime, PerfMon,
+ResponseCodesPerSecond, ResponseTimesDistribution, ResponseTimesOverTime,
+ResponseTimesPercentiles
+"""
+import columnar_store
+import csv
+import os
+import sys
+import time
+from array import array
+from xml.etree import cElementTree
+
+
+#fields of a csv jtl saved without the field names, in the order JMeter
+#writes the fields enabled in the test plan listeners.
+DEFAULT_CSV_FIELDS = ['timeStamp', 'elapsed', 'label', 'responseCode',
+                      'responseMessage', 'threadName', 'dataType', 'success',
+                      'failureMessage', 'bytes', 'Latency']
+
+#period of the over time reports.
+OVER_TIME_GRANULARITY_MS = 1000
+
+#width of the response time ranges of the distribution report.
+DISTRIBUTION_GRANULARITY_MS = 100
+
+#PerfMon samples store the metric value multiplied by this in elapsed.
+PERFMON_VALUE_SCALE = 1000.0
+
+
+class Sample(object):
+    """A sample result read from a jtl file."""
+    __slots__ = ['timestamp', 'elapsed', 'latency', 'label', 'code',
+                 'success', 'bytes']
+
+    def __init__(self, timestamp, elapsed, latency, label, code, success,
+                 bytes):
+        self.timestamp = timestamp
+        self.elapsed = elapsed
+        self.latency = latency
+        self.label = label
+        self.code = code
+        self.success = success
+        self.bytes = bytes
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _iter_xml_samples(fp):
+    depth = 0
+    root = None
+    try:
+        for event, elem in cElementTree.iterparse(fp, events=('start',
+                                                               'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            #samples nested in a sample are its sub results, the reports
+            #only count the top level samples.
+            if depth == 1:
+                attrs = elem.attrib
+                yield Sample(_to_int(attrs.get('ts')),
+                             _to_int(attrs.get('t')),
+                             _to_int(attrs.get('lt')),
+                             attrs.get('lb', ''), attrs.get('rc', ''),
+                             attrs.get('s') == 'true',
+                             _to_int(attrs.get('by')))
+                root.clear()
+    except SyntaxError:
+        #the listener is still writing the file, the last sample and the
+        #closing tag are missing.
+        pass
+
+
+def _iter_csv_samples(fp):
+    reader = csv.reader(fp)
+    fields = DEFAULT_CSV_FIELDS
+    for row in reader:
+        if not row:
+            continue
+        if row[0] == 'timeStamp':
+            fields = row
+            continue
+        values = dict(zip(fields, row))
+        yield Sample(_to_int(values.get('timeStamp')),
+                     _to_int(values.get('elapsed')),
+                     _to_int(values.get('Latency')),
+                     values.get('label', ''), values.get('responseCode', ''),
+                     values.get('success') == 'true',
+                     _to_int(values.get('bytes')))
+
+
+def _iter_columnar_samples(filename):
+    reader = columnar_store.ColumnarReader(filename)
+    try:
+        columns = []
+        for field in ['timeStamp', 'elapsed', 'Latency', 'label',
+                      'responseCode', 'success', 'bytes']:
+            if field in reader.fields:
+                columns.append(reader.column(field))
+            else:
+                columns.append([None] * reader.rows)
+        for timestamp, elapsed, latency, label, code, success, bytes in \
+            zip(*columns):
+            yield Sample(_to_int(timestamp), _to_int(elapsed),
+                         _to_int(latency), label or '',
+                         '' if code is None else unicode(code),
+                         success in ('true', True), _to_int(bytes))
+    finally:
+        reader.close()
+
+
+def iter_jtl_samples(filename):
+    """Return an iterator over the top level samples of a jtl file."""
+    if columnar_store.is_columnar_file(filename):
+        for sample in _iter_columnar_samples(filename):
+            yield sample
+        return
+    fp = open(filename, 'rb')
+    try:
+        head = fp.read(512).lstrip()
+        fp.seek(0)
+        if head.startswith('<'):
+            samples = _iter_xml_samples(fp)
+        else:
+            samples = _iter_csv_samples(fp)
+        for sample in samples:
+            yield sample
+    finally:
+        fp.close()
+
+
+def percent_point(sorted_values, percent):
+    """Return the value below which percent of the sorted values fall."""
+    if not sorted_values:
+        return 0
+    if percent >= 1.0:
+        return sorted_values[-1]
+    #same point as the JMeter StatCalculator.
+    return sorted_values[max(int(len(sorted_values) * percent) - 1, 0)]
+
+
+def format_elapsed_time(elapsed_ms):
+    """Format the time elapsed since the first sample as hh:mm:ss."""
+    seconds = elapsed_ms / 1000
+    return "%02d:%02d:%02d" % (seconds / 3600, seconds / 60 % 60,
+                               seconds % 60)
+
+
+class ElapsedTimes(object):
+    """Response times of the samples by label, shared by the reports."""
+
+    def __init__(self):
+        self.by_label = {}
+        self.sorted_by_label = None
+
+    def add(self, sample):
+        values = self.by_label.get(sample.label)
+        if values is None:
+            values = self.by_label[sample.label] = array('l')
+        values.append(sample.elapsed)
+
+    def get_sorted(self, label):
+        """Return the sorted response times of the label."""
+        if self.sorted_by_label is None:
+            self.sorted_by_label = {}
+        values = self.sorted_by_label.get(label)
+        if values is None:
+            values = self.sorted_by_label[label] = \
+                     sorted(self.by_label.get(label, []))
+        return values
+
+    def get_all_sorted(self):
+        """Return the sorted response times of all the samples."""
+        values = []
+        for label_values in self.by_label.itervalues():
+            values.extend(label_values)
+        values.sort()
+        return values
+
+
+class JTLReport(object):
+    """A csv report computed from the samples of a jtl file."""
+    #whether the report reads the shared ElapsedTimes.
+    uses_elapsed_times = False
+
+    def __init__(self, elapsed_times):
+        self.elapsed_times = elapsed_times
+        self.labels = []
+
+    def _add_label(self, label, values):
+        if label not in values:
+            self.labels.append(label)
+
+    def add(self, sample):
+        """Aggregate the sample."""
+        raise NotImplementedError()
+
+    def fetch_rows(self):
+        """Return the header and the rows of the report."""
+        raise NotImplementedError()
+
+
+class AggregateReport(JTLReport):
+    uses_elapsed_times = True
+
+    def __init__(self, elapsed_times):
+        super(AggregateReport, self).__init__(elapsed_times)
+        #label: [count, sum, sum of squares, min, max, errors, bytes,
+        #        first timestamp, last end time]
+        self.stats = {}
+
+    def add(self, sample):
+        stats = self.stats.get(sample.label)
+        if stats is None:
+            self._add_label(sample.label, self.stats)
+            stats = self.stats[sample.label] = [0, 0, 0, sample.elapsed,
+                                                sample.elapsed, 0, 0,
+                                                sample.timestamp,
+                                                sample.timestamp]
+        elapsed = sample.elapsed
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += elapsed * elapsed
+        if elapsed < stats[3]:
+            stats[3] = elapsed
+        if elapsed > stats[4]:
+            stats[4] = elapsed
+        if not sample.success:
+            stats[5] += 1
+        stats[6] += sample.bytes
+        if sample.timestamp < stats[7]:
+            stats[7] = sample.timestamp
+        if sample.timestamp + elapsed > stats[8]:
+            stats[8] = sample.timestamp + elapsed
+
+    def _fetch_row(self, label, stats, sorted_values):
+        count, total, squares, min_time, max_time, errors, bytes, start, \
+            end = stats
+        average = float(total) / count
+        duration = (end - start) / 1000.0
+        rate = count / duration if duration else 0.0
+        bandwidth = bytes / 1024.0 / duration if duration else 0.0
+        stddev = max(float(squares) / count - average * average, 0) ** 0.5
+        return [label, count, int(average),
+                percent_point(sorted_values, 0.5),
+                percent_point(sorted_values, 0.9), min_time, max_time,
+                "%.2f%%" % (errors * 100.0 / count), "%.1f/sec" % rate,
+                "%.1f" % bandwidth, "%.2f" % stddev]
+
+    def fetch_rows(self):
+        header = ['sampler_label', 'aggregate_report_count', 'average',
+                  'aggregate_report_median', 'aggregate_report_90%_line',
+                  'aggregate_report_min', 'aggregate_report_max',
+                  'aggregate_report_error%', 'aggregate_report_rate',
+                  'aggregate_report_bandwidth', 'aggregate_report_stddev']
+        rows = []
+        total = None
+        for label in self.labels:
+            stats = self.stats[label]
+            rows.append(self._fetch_row(label, stats,
+                            self.elapsed_times.get_sorted(label)))
+            if total is None:
+                total = list(stats)
+                continue
+            for index in range(3) + [5, 6]:
+                total[index] += stats[index]
+            total[3] = min(total[3], stats[3])
+            total[4] = max(total[4], stats[4])
+            total[7] = min(total[7], stats[7])
+            total[8] = max(total[8], stats[8])
+        if total is not None:
+            rows.append(self._fetch_row('TOTAL', total,
+                            self.elapsed_times.get_all_sorted()))
+        return header, rows
+
+
+class OverTimeReport(JTLReport):
+    """Values of the samples by label, over periods of the test."""
+    x_header = 'Elapsed time'
+    granularity = OVER_TIME_GRANULARITY_MS
+
+    def __init__(self, elapsed_times):
+        super(OverTimeReport, self).__init__(elapsed_times)
+        #label: {period start: [sum, count]}
+        self.periods = {}
+        self.start = None
+
+    def fetch_label_value(self, sample):
+        """Return the label and the value of the sample."""
+        raise NotImplementedError()
+
+    def fetch_period_value(self, total, count):
+        """Return the value reported for the period."""
+        return "%.2f" % (float(total) / count)
+
+    def add(self, sample):
+        label, value = self.fetch_label_value(sample)
+        if self.start is None or sample.timestamp < self.start:
+            self.start = sample.timestamp
+        periods = self.periods.get(label)
+        if periods is None:
+            self._add_label(label, self.periods)
+            periods = self.periods[label] = {}
+        period = sample.timestamp - sample.timestamp % self.granularity
+        totals = periods.get(period)
+        if totals is None:
+            periods[period] = [value, 1]
+        else:
+            totals[0] += value
+            totals[1] += 1
+
+    def fetch_rows(self):
+        header = [self.x_header] + self.labels
+        all_periods = set()
+        for periods in self.periods.itervalues():
+            all_periods.update(periods)
+        rows = []
+        start = self.start - self.start % self.granularity \
+                if self.start is not None else 0
+        for period in sorted(all_periods):
+            row = [format_elapsed_time(period - start)]
+            for label in self.labels:
+                totals = self.periods[label].get(period)
+                row.append(self.fetch_period_value(*totals) if totals
+                           else '')
+            rows.append(row)
+        return header, rows
+
+
+class ResponseTimesOverTime(OverTimeReport):
+    def fetch_label_value(self, sample):
+        return sample.label, sample.elapsed
+
+
+class LatenciesOverTime(OverTimeReport):
+    def fetch_label_value(self, sample):
+        return sample.label, sample.latency
+
+
+class PerfMon(OverTimeReport):
+    def fetch_label_value(self, sample):
+        return sample.label, sample.elapsed / PERFMON_VALUE_SCALE
+
+
+class HitsPerSecond(OverTimeReport):
+    def fetch_label_value(self, sample):
+        return 'Server Hits per Second', 1
+
+    def fetch_period_value(self, total, count):
+        return "%.2f" % (total * 1000.0 / self.granularity)
+
+
+class ResponseCodesPerSecond(HitsPerSecond):
+    def fetch_label_value(self, sample):
+        return sample.code or 'N/A', 1
+
+
+class ResponseTimesDistribution(JTLReport):
+    def __init__(self, elapsed_times):
+        super(ResponseTimesDistribution, self).__init__(elapsed_times)
+        #label: {response time range start: count}
+        self.ranges = {}
+
+    def add(self, sample):
+        ranges = self.ranges.get(sample.label)
+        if ranges is None:
+            self._add_label(sample.label, self.ranges)
+            ranges = self.ranges[sample.label] = {}
+        start = sample.elapsed - sample.elapsed % DISTRIBUTION_GRANULARITY_MS
+        ranges[start] = ranges.get(start, 0) + 1
+
+    def fetch_rows(self):
+        header = ['Response time'] + self.labels
+        all_ranges = set()
+        for ranges in self.ranges.itervalues():
+            all_ranges.update(ranges)
+        rows = []
+        for start in sorted(all_ranges):
+            rows.append([start] + [self.ranges[label].get(start, '')
+                                   for label in self.labels])
+        return header, rows
+
+
+class ResponseTimesPercentiles(JTLReport):
+    uses_elapsed_times = True
+
+    def add(self, sample):
+        if sample.label not in self.labels:
+            self.labels.append(sample.label)
+
+    def fetch_rows(self):
+        header = ['Percentiles'] + self.labels
+        rows = []
+        for percent in range(101):
+            row = [percent]
+            for label in self.labels:
+                row.append(percent_point(
+                    self.elapsed_times.get_sorted(label), percent / 100.0))
+            rows.append(row)
+        return header, rows
+
+
+REPORTS = {
+    'AggregateReport': AggregateReport,
+    'HitsPerSecond': HitsPerSecond,
+    'LatenciesOverTime': LatenciesOverTime,
+    'PerfMon': PerfMon,
+    'ResponseCodesPerSecond': ResponseCodesPerSecond,
+    'ResponseTimesDistribution': ResponseTimesDistribution,
+    'ResponseTimesOverTime': ResponseTimesOverTime,
+    'ResponseTimesPercentiles': ResponseTimesPercentiles}
+
+
+def aggregate_jtl(jtl_file, plugins):
+    """
+    Stream the jtl file once and return the {plugin: (header, rows)} of the
+    reports of the plugins.
+    """
+    elapsed_times = ElapsedTimes()
+    reports = dict([(plugin, REPORTS[plugin](elapsed_times))
+                    for plugin in plugins])
+    add_functions = [report.add for report in reports.itervalues()]
+    if [report for report in reports.itervalues()
+        if report.uses_elapsed_times]:
+        add_functions.append(elapsed_times.add)
+    for sample in iter_jtl_samples(jtl_file):
+        for add in add_functions:
+            add(sample)
+    return dict([(plugin, report.fetch_rows())
+                 for plugin, report in reports.iteritems()])
+
+
+def write_csv_report(filename, header, rows):
+    fp = open(filename, 'wb')
+    writer = csv.writer(fp)
+    writer.writerow(header)
+    writer.writerows(rows)
+    fp.close()
+
+
+def generate_csv_reports(jtl_file, dest_dir, plugins):
+    """Write the <plugin>.csv reports of the jtl file in dest_dir."""
+    for plugin, (header, rows) in aggregate_jtl(jtl_file, plugins).items():
+        write_csv_report(os.path.join(dest_dir, plugin + ".csv"), header,
+                         rows)
+
+
+def main():
+    if len(sys.argv) < 4:
+        print __doc__
+        sys.exit(0)
+    plugins = sys.argv[3:]
+    for plugin in plugins:
+        if plugin not in REPORTS:
+            print "Unknown plugin %s" % plugin
+            sys.exit(1)
+    start = time.time()
+    generate_csv_reports(sys.argv[1], sys.argv[2], plugins)
+    print "Generated %s in %.2f sec" % (", ".join(plugins),
+                                        time.time() - start)
+
+
+if __name__ == '__main__':
+    main()
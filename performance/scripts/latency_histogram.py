@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+Log-bucketed (HDR style) latency histograms of the task times.
+
+Values below SUB_BUCKET_COUNT ms are counted exactly. Above it each power of 2
+range is split in SUB_BUCKET_COUNT / 2 buckets, so a value is known within
+1/128 of itself whatever the number of requests, with at most a few
+thousand buckets. Histograms are merged by adding the counts of the buckets,
+the merged percentiles are the ones of all the merged values.
+
+Histograms are saved in csv files, one row per (label, group):
+label,group,count,min,max,sum,buckets
+where buckets is a space separated list of <bucket index>:<count>.
+
+Usage, merge the histograms of several runs or shard files:
+python latency_histogram.py <histograms_csv> [<histograms_csv> ...]
+[-o <merged_histograms_csv>]
+"""
+import csv
+import math
+import numpy
+import sys
+from optparse import OptionParser
+
+
+SUB_BUCKET_BITS = 8
+
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+SUB_BUCKET_HALF_COUNT = SUB_BUCKET_COUNT >> 1
+
+#percentiles of the reports.
+PERCENTILES = [50, 90, 95, 99, 99.9]
+
+HISTOGRAMS_HEADER = ['label', 'group', 'count', 'min', 'max', 'sum',
+                     'buckets']
+
+
+def percentile_name(percent):
+    """Return the report field name of the percentile, eg. p99.9"""
+    return 'p%s' % ('%f' % percent).rstrip('0').rstrip('.')
+
+
+def bucket_indexes(values):
+    """Return the bucket indexes of an array of non-negative ints."""
+    values = numpy.asarray(values, dtype=numpy.int64)
+    #frexp returns the bit length of the value as exponent.
+    exponents = numpy.maximum(numpy.frexp(values.astype(numpy.float64))[1] -
+                              SUB_BUCKET_BITS, 0)
+    return exponents * SUB_BUCKET_HALF_COUNT + (values >> exponents)
+
+
+def bucket_highest_value(index):
+    """Return the highest value counted in the bucket."""
+    exponent = max(index // SUB_BUCKET_HALF_COUNT - 1, 0)
+    lowest_value = (index - exponent * SUB_BUCKET_HALF_COUNT) << exponent
+    return lowest_value + (1 << exponent) - 1
+
+
+class LatencyHistogram(object):
+    """Histogram of the values of a task, in log sized buckets."""
+
+    def __init__(self):
+        #{bucket index: count}
+        self.buckets = {}
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+
+    def record_values(self, values):
+        """Count the values of an array, NaN values are skipped."""
+        values = numpy.asarray(values, dtype=numpy.float64)
+        values = values[~numpy.isnan(values)]
+        if not len(values):
+            return
+        values = numpy.maximum(numpy.rint(values), 0).astype(numpy.int64)
+        counts = numpy.bincount(bucket_indexes(values))
+        indexes = numpy.flatnonzero(counts)
+        for index, count in zip(indexes.tolist(),
+                                counts[indexes].tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self._add_totals(len(values), int(values.min()), int(values.max()),
+                         int(values.sum()))
+
+    def _add_totals(self, count, min_value, max_value, total):
+        self.count += count
+        self.sum += total
+        if self.min is None or min_value < self.min:
+            self.min = min_value
+        if self.max is None or max_value > self.max:
+            self.max = max_value
+
+    def merge(self, other):
+        """Add the values of the other histogram."""
+        if not other.count:
+            return
+        for index, count in other.buckets.iteritems():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self._add_totals(other.count, other.min, other.max, other.sum)
+
+    def percentile(self, percent):
+        """Return the value below which percent % of the values are."""
+        if not self.count:
+            return None
+        rank = max(int(math.ceil(percent / 100.0 * self.count)), 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(bucket_highest_value(index), self.max)
+        return self.max
+
+    def average(self):
+        if not self.count:
+            return None
+        return float(self.sum) / self.count
+
+    def encode_buckets(self):
+        return ' '.join(['%d:%d' % (index, self.buckets[index])
+                         for index in sorted(self.buckets)])
+
+    def to_row(self, label, group):
+        """Return the histograms csv row of the histogram."""
+        return [label, group, self.count, self.min, self.max, self.sum,
+                self.encode_buckets()]
+
+    @classmethod
+    def from_row(cls, row):
+        """Return the histogram of a histograms csv row (dict)."""
+        histogram = cls()
+        if not int(row['count']):
+            return histogram
+        for bucket in row['buckets'].split():
+            index, count = bucket.split(':')
+            histogram.buckets[int(index)] = int(count)
+        histogram._add_totals(int(row['count']), int(row['min']),
+                              int(row['max']), int(row['sum']))
+        return histogram
+
+
+def write_histograms(filename, histograms):
+    """Write the {(label, group): histogram} to a histograms csv file."""
+    fp = open(filename, 'wb')
+    writer = csv.writer(fp)
+    writer.writerow(HISTOGRAMS_HEADER)
+    for (label, group), histogram in sorted(histograms.iteritems()):
+        writer.writerow(histogram.to_row(label, group))
+    fp.close()
+
+
+def read_histograms(filename):
+    """Return the {(label, group): histogram} of a histograms csv file."""
+    histograms = {}
+    fp = open(filename, 'rb')
+    for row in csv.DictReader(fp):
+        histograms[(row['label'], row['group'])] = \
+                                        LatencyHistogram.from_row(row)
+    fp.close()
+    return histograms
+
+
+def merge_histograms(histograms_list):
+    """Merge the {(label, group): histogram} maps of several files."""
+    merged = {}
+    for histograms in histograms_list:
+        for key, histogram in histograms.iteritems():
+            if key not in merged:
+                merged[key] = LatencyHistogram()
+            merged[key].merge(histogram)
+    return merged
+
+
+def main():
+    oparser = OptionParser(usage="python latency_histogram.py "
+                                 "<histograms_csv> [<histograms_csv> ...] "
+                                 "[-o <merged_histograms_csv>]")
+    oparser.add_option('-o', '--output', default=None,
+                       help="Write the merged histograms to this file")
+    (options, args) = oparser.parse_args(sys.argv[1:])
+    if not args:
+        print __doc__
+        sys.exit(0)
+    merged = merge_histograms([read_histograms(fname) for fname in args])
+    if options.output:
+        write_histograms(options.output, merged)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(['label', 'group', 'count', 'min', 'avg', 'max'] +
+                    [percentile_name(percent) for percent in PERCENTILES])
+    for (label, group), histogram in sorted(merged.iteritems()):
+        average = histogram.average()
+        writer.writerow([label, group, histogram.count, histogram.min,
+                         '' if average is None else '%.2f' % average,
+                         histogram.max] +
+                        [histogram.percentile(percent)
+                         for percent in PERCENTILES])
+
+
+if __name__ == '__main__':
+    main()
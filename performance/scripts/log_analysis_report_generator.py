@@ -1,30 +1,131 @@
 #!/usr/bin/env python
 
 '''Script that generates HTML reports out of .csv files.
-Input - CSV files
+Input - CSV files, or columnar (.col) files (see columnar_store.py)
 Output - HTML reports
 '''
-import cairoplot
-import copy
+import chart_backends
+import columnar_store
 import csv
 import gettext
+import html_table_writer
+import latency_histogram
 import markup
+import numpy
 import os
 import shutil
 import sys
 import utils
 from glob import glob
+from optparse import OptionParser
 from os import path, access, R_OK, W_OK
 
 
 gettext.install('log_analysis_report_generator', unicode=1)
 
 
-report_csv_file_map = {'ServiceLevelReport': '_index.csv',
-                        'NovaAPIService': '_nova-api.csv',
-                        'NovaSchedulerService': '_scheduler.csv',
-                        'NovaComputeService': '_compute.csv',
-                        'NovaNetworkService': '_network.csv'}
+report_csv_file_map = {'ServiceLevelReport': '_index',
+                        'NovaAPIService': '_nova-api',
+                        'NovaSchedulerService': '_scheduler',
+                        'NovaComputeService': '_compute',
+                        'NovaNetworkService': '_network'}
+
+
+#extensions of the results files, see PerfResultsLogger.
+results_file_extensions = ['.csv', '.col']
+
+
+#summary rows of each metric, in report order.
+summary_fields = ['min', 'avg', 'max'] + \
+                 [latency_histogram.percentile_name(percent)
+                  for percent in latency_histogram.PERCENTILES]
+
+
+#numpy dtypes of the columnar_store column types.
+NUMPY_DTYPES = {'int64': '<i8', 'float64': '<f8'}
+
+
+def _to_float_column(values):
+    """
+    Convert a column to a float array, the malformed values become NaN.
+    """
+    try:
+        return values.astype(numpy.float64)
+    except (TypeError, ValueError):
+        return numpy.array([_to_float(value) for value in values])
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return numpy.nan
+
+
+class ResultsTable(object):
+    """
+    A csv or columnar results file, parsed once for the routing, the
+    summaries, the graphs and the tabular report of the file.
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.fields = []
+        #{field: numpy array}, converted from the rows when first used.
+        self.columns = {}
+        self._rows = None
+        if fname.endswith('.col'):
+            self._load_columnar()
+        else:
+            self._load_csv()
+
+    def _load_csv(self):
+        fp = open(self.fname, 'rb')
+        csv_iter = csv.reader(fp)
+        self.fields = csv_iter.next()
+        self._rows = [row for row in csv_iter if row]
+        fp.close()
+
+    def _load_columnar(self):
+        reader = columnar_store.ColumnarReader(self.fname)
+        for field in reader.fields:
+            parts = []
+            for row_group, (column_type, data) in zip(reader.row_groups,
+                                            reader.column_blocks(field)):
+                if data is None:
+                    parts.append(numpy.empty(row_group.rows))
+                    parts[-1].fill(numpy.nan)
+                elif column_type == 'str':
+                    parts.append(numpy.array(data, dtype=object))
+                else:
+                    #raw blocks are not copied out of the mapped file.
+                    parts.append(numpy.frombuffer(data,
+                                                  NUMPY_DTYPES[column_type]))
+            self.columns[field] = numpy.concatenate(parts) if parts else \
+                                  numpy.empty(0)
+        #the arrays keep the mapping of the file alive.
+        reader.fp.close()
+        self.fields = reader.fields
+
+    def column(self, field):
+        """Return the numpy array of the values of the field."""
+        values = self.columns.get(field)
+        if values is None:
+            index = self.fields.index(field)
+            values = numpy.array([row[index] if index < len(row) else ''
+                                  for row in self._rows], dtype=object)
+            self.columns[field] = values
+        return values
+
+    @property
+    def rows(self):
+        """The list of rows, lists of the csv values of the fields."""
+        if self._rows is None:
+            columns = [[columnar_store.format_csv_value(value)
+                        for value in self.column(field).tolist()]
+                       for field in self.fields]
+            self._rows = zip(*columns)
+        return self._rows
 
 
 instance_type_id_name_map = {'1': 'm1.tiny',
@@ -38,7 +139,8 @@ class HTMLReportGenerator:
     IMG_WIDTH = 800
     IMG_HEIGHT = 600
 
-    def __init__(self, timestamped_dir, reports_dir):
+    def __init__(self, timestamped_dir, reports_dir, chart_backend='svg',
+                 workers=None):
         self.config = utils.PerfAnalyzerConfig()
         self.source_dir = os.path.join(self.config.result_file_dir,\
                                         timestamped_dir,
@@ -58,12 +160,26 @@ class HTMLReportGenerator:
         self.a_style = "text-decoration:none; font-family:Verdana,sans-serif;"\
                        " font-size:8pt; margin-right: 20px"
         self.table_style = "font-family:Verdana, sans-serif; text-align:left"
+        #{results file name: ResultsTable} of the files being reported.
+        self.tables = {}
+        self.chart_backend = chart_backend
+        self.chart_extension = chart_backends.get_backend(
+                                                    chart_backend).extension
+        self.workers = workers
+        #charts of the report, rendered at once by _render_charts.
+        self.charts = []
 
     def _fetch_csv_files_from_source_dir(self):
         """
-        Fetch the csv files from source_dir.
+        Fetch the csv and columnar files from source_dir. The csv export of a
+        columnar file (see _export_csv) is not a results file of its own.
         """
-        csv_files = glob(path.join(self.source_dir, "*.csv"))
+        csv_files = []
+        for extension in results_file_extensions:
+            csv_files.extend(glob(path.join(self.source_dir, "*" + extension)))
+        csv_files = [fname for fname in csv_files
+                     if not (fname.endswith('.csv') and
+                             path.splitext(fname)[0] + '.col' in csv_files)]
         if len(csv_files) == 0:
             print _("No csv files available for generating reports")
             sys.exit(0)
@@ -73,154 +189,211 @@ class HTMLReportGenerator:
         """
         Fetch the report name from the csv file name.
         """
+        csv_name = path.splitext(csv_name)[0]
         for report_name, csv_str in report_csv_file_map.iteritems():
             if csv_name.endswith(csv_str):
                 return report_name
         return None
 
-    def _fetch_api_name(self, csv_name):
-        """"
-        Fetch the API name field from the csv.
+    def _load_table(self, csv_fname):
+        """
+        Return the ResultsTable of a results file, parsed only once.
+        """
+        table = self.tables.get(csv_fname)
+        if table is None:
+            table = self.tables[csv_fname] = ResultsTable(csv_fname)
+        return table
+
+    def _export_csv(self, table):
+        """
+        Copy the results file to reports_dir as a csv file, returns the csv
+        file name.
         """
-        fp = open(csv_name, 'rb')
-        csv_iter = csv.DictReader(fp)
-        row1 = csv_iter.next()
+        fname = path.join(self.reports_dir,
+                          path.splitext(path.basename(table.fname))[0] + '.csv')
+        if not table.fname.endswith('.col'):
+            if path.dirname(table.fname) != self.reports_dir:
+                shutil.copy(table.fname, self.reports_dir)
+            return fname
+        fp = open(fname, 'wb')
+        csv_writer = csv.writer(fp)
+        csv_writer.writerow(table.fields)
+        csv_writer.writerows(table.rows)
         fp.close()
-        return row1['api_name']
-
-    def _calculate_summary_metrics(self, metric, results_list):
-        skip_field_response = {'min': '-',
-                               'max': '-',
-                               'avg': '-',
-                               'request_count': 0}
-        values = []
-        for result in results_list:
-            try:
-                values.append(int(result[metric]))
-            except ValueError:
-                return skip_field_response
-            except TypeError:
-                return skip_field_response
-
-        result = {'min': min(values),
-                  'max': max(values),
-                  'avg': sum(values) / len(values),
-                  'request_count': len(values)}
-        return result
-
-    def _fetch_metrics(self, csv_fname):
-        """
-        Calculate the avg, min, max from the metrics.
+        return fname
+
+    def _fetch_api_name(self, table):
+        """"
+        Fetch the API name field from the results table.
+        """
+        return table.column('api_name')[0]
+
+    def _calculate_summary_metrics(self, values, group_ids=None,
+                                   group_count=1):
+        """
+        Calculate the min, avg, max, percentiles and request_count of each
+        metric of the values (a metrics x rows float array) for each group of
+        rows, malformed metric values are NaN and skipped. Returns the list of
+        the summaries of the groups and the list of the histograms of their
+        metrics.
+        """
+        if group_ids is None:
+            starts = [0]
+            request_counts = [values.shape[1]]
+        else:
+            order = numpy.argsort(group_ids, kind='mergesort')
+            values = values[:, order]
+            request_counts = numpy.bincount(group_ids, minlength=group_count)
+            #index of the first row of each group.
+            starts = numpy.cumsum(request_counts) - request_counts
+        valid = ~numpy.isnan(values)
+        counts = numpy.add.reduceat(valid, starts, axis=1)
+        sums = numpy.add.reduceat(numpy.where(valid, values, 0), starts,
+                                  axis=1)
+        mins = numpy.fmin.reduceat(values, starts, axis=1)
+        maxs = numpy.fmax.reduceat(values, starts, axis=1)
+
+        summaries = []
+        histograms = []
+        for group in range(group_count):
+            summary = dict([(field, []) for field in summary_fields])
+            summary['request_count'] = int(request_counts[group])
+            group_histograms = []
+            group_values = values[:, starts[group]:starts[group] +
+                                  request_counts[group]]
+            for index in range(len(values)):
+                histogram = latency_histogram.LatencyHistogram()
+                histogram.record_values(group_values[index])
+                group_histograms.append(histogram)
+                count = counts[index, group]
+                if not count:
+                    for field in summary_fields:
+                        summary[field].append('-')
+                    continue
+                summary['min'].append(int(mins[index, group]))
+                summary['max'].append(int(maxs[index, group]))
+                summary['avg'].append(round(sums[index, group] / count, 2))
+                for percent in latency_histogram.PERCENTILES:
+                    summary[latency_histogram.percentile_name(percent)].append(
+                                histogram.percentile(percent))
+            summaries.append(summary)
+            histograms.append(group_histograms)
+        return summaries, histograms
+
+    def _fetch_metrics(self, table):
+        """
+        Calculate the summary metrics and the histograms of the metrics.
+        Returns the labels, the summary metrics and the {(label, group):
+        histogram} of the metrics.
         """
         #fetch the fields in the order to display.
-        fp = open(csv_fname, 'rb')
-        csv_iter = csv.reader(fp)
-        headers = csv_iter.next()
+        headers = list(table.fields)
         if 'compute_host' in headers:
             headers.remove('compute_host')
-        row1 = csv_iter.next()
-        fp.close()
-        api_name = row1[0]
+        api_name = self._fetch_api_name(table)
         #only Create Server API has instance_type parameter.
         if api_name == 'create':
             labels = headers[6:]
-            summary_metrics = self._fetch_summary_metrics_by_instance_type(
-                                    csv_fname,
-                                    labels)
+            summary_metrics, group_histograms = \
+                self._fetch_summary_metrics_by_instance_type(table, labels)
         else:
             labels = headers[5:]
-            summary_metrics = self._fetch_summary_metrics(csv_fname, labels)
-        return labels, summary_metrics
-
-    def _fetch_summary_metrics(self, csv_fname, labels):
+            summary_metrics, histograms = self._fetch_summary_metrics(
+                                                            table, labels)
+            group_histograms = {'all': histograms}
+        histograms = {}
+        for group, metric_histograms in group_histograms.iteritems():
+            for label, histogram in zip(labels, metric_histograms):
+                histograms[(label, group)] = histogram
+        return labels, summary_metrics, histograms
+
+    def _fetch_metric_values(self, table, labels):
         """
-        Calculate the avg, min, max from the metrics.
+        Return the labels x rows float array of the metrics.
         """
-        fp = open(csv_fname, 'rb')
-        csv_iter = csv.DictReader(fp)
-        metrics = []
-        for row in csv_iter:
-            metrics.append(row)
-        fp.close()
+        return numpy.vstack([_to_float_column(table.column(label))
+                             for label in labels])
 
-        metrics_summary = {'min': [], 'max': [], 'avg': [], 'request_count': 0}
-        for label in labels:
-            summary = self._calculate_summary_metrics(label, metrics)
-            metrics_summary['min'].append(summary['min'])
-            metrics_summary['max'].append(summary['max'])
-            metrics_summary['avg'].append(summary['avg'])
-            metrics_summary['request_count'] = summary['request_count']
-        return metrics_summary
+    def _fetch_summary_metrics(self, table, labels):
+        """
+        Calculate the summary metrics and the histograms of the metrics.
+        """
+        values = self._fetch_metric_values(table, labels)
+        summaries, histograms = self._calculate_summary_metrics(values)
+        return summaries[0], histograms[0]
 
-    def _fetch_summary_metrics_by_instance_type(self, csv_fname, labels):
+    def _fetch_summary_metrics_by_instance_type(self, table, labels):
         """
-        Calculate the avg, min, max from the metrics for each instance_type.
+        Calculate the summary metrics and the histograms of the metrics for
+        each instance_type.
         """
-        fp = open(csv_fname, 'rb')
-        csv_iter = csv.DictReader(fp)
         #group the results by instance_type
-        instance_type_metric_map = {}
-        for row in csv_iter:
-            instance_type = row['instance_type']
-            if instance_type not in instance_type_metric_map:
-                instance_type_metric_map[instance_type] = []
-            instance_type_metric_map[instance_type].append(row)
-        fp.close()
+        instance_types = table.column('instance_type')
+        if instance_types.dtype == object:
+            instance_types = instance_types.astype(str)
+        instance_types, group_ids = numpy.unique(instance_types,
+                                                 return_inverse=True)
+        values = self._fetch_metric_values(table, labels)
+        summaries, histograms = self._calculate_summary_metrics(values,
+                                            group_ids, len(instance_types))
+        instance_types = [str(instance_type) for instance_type in
+                          instance_types.tolist()]
+        return dict(zip(instance_types, summaries)), \
+               dict(zip(instance_types, histograms))
+
+    def _add_chart(self, fname_root, data, page, alt_text, x_title, labels):
+        """
+        Add a dot line chart of the {series name: values} to the page, the
+        chart file is rendered later with the others by _render_charts.
+        """
+        chart_file = "%s.%s" % (fname_root, self.chart_extension)
+        self.charts.append((path.join(self.reports_dir, chart_file), data,
+                            self.IMG_WIDTH, self.IMG_HEIGHT,
+                            {'y_title': "Time in ms", 'x_title': x_title,
+                             'x_labels': labels}))
+        page.img(src=chart_file, alt=alt_text)
+        page.br()
 
-        #generate summary metrics for each instance_type.
-        instance_type_metric_summary_map = {}
-        for instance_type, value_dict in instance_type_metric_map.iteritems():
-            type_results = {'min': [], 'max': [], 'avg': [],
-                            'request_count': 0}
-            for label in labels:
-                result = self._calculate_summary_metrics(label, value_dict)
-                type_results['min'].append(result['min'])
-                type_results['max'].append(result['max'])
-                type_results['avg'].append(result['avg'])
-                type_results['request_count'] = result['request_count']
-            instance_type_metric_summary_map[instance_type] = type_results
-        return instance_type_metric_summary_map
-
-    def _generate_graphical_summary_report(self, metrics, page, avg_png_file,
+    def _render_charts(self):
+        """
+        Render the charts of the report, in parallel.
+        """
+        chart_backends.render_charts(self.chart_backend, self.charts,
+                                     self.workers)
+        self.charts = []
+
+    def _generate_graphical_summary_report(self, metrics, page, avg_file_root,
         labels):
         """
         Generate the graph of average time taken for each instance type.
         """
-        avg_png_fpath = path.join(self.reports_dir, avg_png_file)
         avg_graph_data = {}
         for instance_type_id, graph_data in metrics.iteritems():
             instance_type_name = instance_type_id_name_map[instance_type_id]
             key = "%s" % instance_type_name
             avg_graph_data[key] = graph_data['avg']
 
-        cairoplot.dot_line_plot(
-                    avg_png_fpath,
-                    avg_graph_data,
-                    self.IMG_WIDTH,
-                    self.IMG_HEIGHT,
-                    axis=True,
-                    series_legend=True,
-                    y_title="Time in ms",
-                    x_title="Average API Response Time Summary - Per "\
-                            "instance type",
-                    x_labels=labels)
-        page.img(src=avg_png_file, alt="Instance Type Summary report")
-        page.br()
+        self._add_chart(avg_file_root, avg_graph_data, page,
+                        "Instance Type Summary report",
+                        "Average API Response Time Summary - Per "\
+                        "instance type", labels)
 
-    def _generate_tabular_summary_report(self, metrics, page, labels):
+    def _generate_tabular_summary_report(self, metrics, page, labels,
+            csv_fname="summary_report.csv",
+            report_name="Instance Type Summary Report"):
         """
         Generate a summary report csv and HTML tabular report.
         """
-        csv_file = path.join(self.reports_dir, "summary_report.csv")
+        csv_file = path.join(self.reports_dir, csv_fname)
         csv_header = ['instance_type', 'label', 'total_requests']
         csv_header.extend(labels)
         data_rows = [csv_header, ]
-        for instance_type, graph_data in metrics.iteritems():
-            data = copy.copy(graph_data)
-            request_count = data.pop('request_count')
-            for op_type, value_list in data.iteritems():
+        for instance_type in sorted(metrics):
+            data = metrics[instance_type]
+            request_count = data['request_count']
+            for op_type in summary_fields:
                 data_row = [instance_type, op_type, request_count]
-                data_row.extend(value_list)
+                data_row.extend(data[op_type])
                 data_rows.append(data_row)
 
         fp = open(csv_file, "w")
@@ -228,7 +401,6 @@ class HTMLReportGenerator:
         csv_writer.writerows(data_rows)
         fp.close()
 
-        report_name = "Instance Type Summary Report"
         report_path = self.generate_tabular_html_report(report_name, csv_file)
         csv_fname = path.basename(csv_file)
         page.a("Download csv report", href=csv_fname,
@@ -238,39 +410,40 @@ class HTMLReportGenerator:
         page.a("Top", href="#top", style=self.a_style)
         page.br()
 
-    def _generate_graph_from_metrics(self, csv_fname, page):
+    def _generate_histograms_report(self, histograms, page, csv_fname):
+        """
+        Write the latency histograms of the metrics to a csv file, they can
+        be merged with the ones of other runs by latency_histogram.py.
+        """
+        latency_histogram.write_histograms(path.join(self.reports_dir,
+                                                     csv_fname), histograms)
+        page.a("Download latency histograms", href=csv_fname,
+               style=self.a_style)
+        page.br()
+
+    def _generate_graph_from_metrics(self, table, page):
         """
-        Generate a line graph (png file) from the available metrics.
+        Generate a line graph (svg or png file) from the available metrics.
         """
-        fname_name_ext = list(path.splitext(path.basename(csv_fname)))
-        avg_png_file = fname_name_ext[0] + '_average.png'
+        fname_name_ext = list(path.splitext(path.basename(table.fname)))
 
-        labels, metrics = self._fetch_metrics(csv_fname)
+        labels, metrics, histograms = self._fetch_metrics(table)
+        self._generate_histograms_report(histograms, page,
+                                         fname_name_ext[0] + '_histograms.csv')
         if 'request_count' in metrics:
             #generate ungrouped report.
-            png_file = fname_name_ext[0] + '.png'
-            png_fpath = path.join(self.reports_dir, png_file)
+            self._generate_tabular_summary_report({'all': metrics}, page,
+                    labels, fname_name_ext[0] + '_summary_report.csv',
+                    "%s Summary Report" % fname_name_ext[0])
             instance_count = metrics.pop('request_count')
-            alt_text = "Service Level Summary Report"
-            cairoplot.dot_line_plot(
-                        png_fpath,
-                        metrics,
-                        self.IMG_WIDTH,
-                        self.IMG_HEIGHT,
-                        axis=True,
-                        series_legend=True,
-                        y_title="Time in ms",
-                        x_title="Response Time Trend - Across services",
-                        x_labels=labels)
-            page.img(src=png_file, alt=alt_text)
-            page.br()
+            self._add_chart(fname_name_ext[0], metrics, page,
+                            "Service Level Summary Report",
+                            "Response Time Trend - Across services", labels)
         else:
-            png_file = fname_name_ext[0] + '_%s.png'
-            png_fpath = path.join(self.reports_dir, png_file)
             #generate reports grouped by instance_type.
             #generate graph for average time taken for each instance type.
             self._generate_graphical_summary_report(metrics, page,
-                    avg_png_file, labels)
+                    fname_name_ext[0] + '_average', labels)
 
             #generate summary csvs.
             self._generate_tabular_summary_report(metrics, page, labels)
@@ -281,35 +454,25 @@ class HTMLReportGenerator:
                 instance_type_name = instance_type_id_name_map[instance_type]
                 alt_text = "Instance type '%s' summary report" % \
                            instance_type_name
-                cairoplot.dot_line_plot(
-                            png_fpath % instance_type,
-                            graph_data,
-                            self.IMG_WIDTH,
-                            self.IMG_HEIGHT,
-                            axis=True,
-                            series_legend=True,
-                            y_title="Time in ms",
-                            x_title="Response Time Trend (For Instance Type: "\
-                                    "%(instance_type_name)s, Instance Count: "\
-                                    "%(instance_count)s)" % locals(),
-                            x_labels=labels)
-                page.img(src=png_file % instance_type, alt=alt_text)
-                page.br()
+                self._add_chart("%s_%s" % (fname_name_ext[0], instance_type),
+                                graph_data, page, alt_text,
+                                "Response Time Trend (For Instance Type: "\
+                                "%(instance_type_name)s, Instance Count: "\
+                                "%(instance_count)s)" % locals(), labels)
 
     def _generate_report_from_csv(self, csv_file, report_name, page):
-        api_name = self._fetch_api_name(csv_file)
+        table = self._load_table(csv_file)
+        api_name = self._fetch_api_name(table)
         report_name = report_name + "-" + api_name.capitalize() + "API"
         #add the graphical report.
         page.h2(report_name, style=self.h2_style)
         if report_name.startswith('ServiceLevelReport'):
-            self._generate_graph_from_metrics(csv_file, page)
+            self._generate_graph_from_metrics(table, page)
         report_path = self.generate_tabular_html_report(report_name,
-                                                        csv_file)
+                                                        csv_file, table)
         if report_path:
-            #copy the csv file to reports directory.
-            if path.dirname(csv_file) != self.reports_dir:
-                shutil.copy(csv_file, self.reports_dir)
-            csv_fname = path.basename(csv_file)
+            #copy the csv file to reports directory, the download is in csv.
+            csv_fname = path.basename(self._export_csv(table))
             page.a("Download csv report", href=csv_fname,
                    style=self.a_style)
             page.a("View csv report", href=report_path,
@@ -318,7 +481,8 @@ class HTMLReportGenerator:
 
     def generate_html_report(self):
         """
-        Generate the html report out of the png files created from csv.
+        Generate the html report, with the charts and the tabular reports of
+        the csv files.
         """
         csv_files = self._fetch_csv_files_from_source_dir()
 
@@ -326,18 +490,21 @@ class HTMLReportGenerator:
         page.init(title="Jenkins")
         page.h1("API Performance report", style=self.h1_style)
         page.hr()
-        index = 0
         ordered_reports_list = ['NovaAPIService', 'NovaSchedulerService',
                                 'NovaComputeService', 'NovaNetworkService',
                                 'ServiceLevelReport']
-        report_idx = 0
-        while report_idx < len(ordered_reports_list):
-            for csv_file in csv_files:
-                report_name = self._fetch_report_name(csv_file)
-                if report_name == ordered_reports_list[report_idx]:
-                    self._generate_report_from_csv(csv_file, report_name, page)
-                    page.br()
-            report_idx += 1
+        reports = []
+        for index, csv_file in enumerate(csv_files):
+            report_name = self._fetch_report_name(csv_file)
+            if report_name in ordered_reports_list:
+                reports.append((ordered_reports_list.index(report_name),
+                                index, csv_file, report_name))
+        for order, index, csv_file, report_name in sorted(reports):
+            self._generate_report_from_csv(csv_file, report_name, page)
+            page.br()
+        #the results files are not needed anymore.
+        self.tables = {}
+        self._render_charts()
 
         #write the performance report html file.
         fpath = path.join(self.reports_dir, 'log_analysis_report.html')
@@ -346,63 +513,57 @@ class HTMLReportGenerator:
         html.close()
         print _("Generated performance report : %s") % fpath
 
-    def _generate_table(self, page, header_list, data_iter):
+    def generate_tabular_html_report(self, report_name, csv_fname,
+                                     table=None):
         """
-        Generate an HTML table from the provided iterator.
-        """
-        page.table(border="2", cellspacing="0", cellpadding="4", width="50%",
-                   style=self.table_style)
-        #write table headers
-        for header in header_list:
-            page.th(header)
-        #write table data rows
-        for item in data_iter:
-            page.tr()
-            for value in item:
-                page.td(value)
-            page.tr.close()
-        page.table.close()
-
-    def generate_tabular_html_report(self, report_name, csv_fname):
-        """
-        Generate the html report out of the csv files.
+        Generate the html report out of the csv files, or out of the already
+        loaded results table of the file. The rows are streamed to the report
+        pages, see html_table_writer.py.
         """
         fname = None
-        if path.exists(csv_fname) and path.isfile(csv_fname) and\
-           access(csv_fname, R_OK):
-            csv_iter = csv.reader(open(csv_fname, 'rb'))
+        writer = html_table_writer.TabularHTMLWriter(self.reports_dir,
+                        report_name, self.h1_style, self.table_style,
+                        self.a_style)
+        if table is not None:
+            fname = writer.write(table.fields, table.rows)
+        elif path.exists(csv_fname) and path.isfile(csv_fname) and\
+             access(csv_fname, R_OK):
+            fp = open(csv_fname, 'rb')
+            csv_iter = csv.reader(fp)
             headers = csv_iter.next()
-
-            page = markup.page()
-            page.init(title="Jenkins")
-            page.h1("Performance report - %s" % report_name,
-                    style=self.h1_style)
-            page.hr()
-            self._generate_table(page, headers, csv_iter)
-
-            #write the performance report html file.
-            fname = '%s_tabular.html' % report_name
-            html = open(path.join(self.reports_dir, fname), 'w')
-            html.write(str(page))
-            html.close()
+            fname = writer.write(headers, csv_iter)
+            fp.close()
         return fname
 
-
 def main():
-    if len(sys.argv) < 3:
+    oparser = OptionParser(usage="./log_analysis_report_generator "
+                                 "test_start_timestamp dest_dir "
+                                 "[-c <chart_backend>] [-w <workers>]")
+    oparser.add_option('-c', '--chart_backend', default='svg',
+                       choices=sorted(chart_backends.chart_backends),
+                       help="Backend rendering the charts: svg or cairo "
+                            "(png files, needs cairoplot)")
+    oparser.add_option('-w', '--workers', default=None, type="int",
+                       help="Number of charts rendered at a time, defaults "
+                            "to the number of cores")
+    (options, args) = oparser.parse_args(sys.argv[1:])
+    if len(args) < 2:
         print _("Usage: ./log_analysis_report_generator test_start_timestamp "\
               "dest_dir"\
               "\ntest_start_timestamp: Time when test was started"\
-              "\ndest_dir: Path to create the HTML report files\n")
+              "\ndest_dir: Path to create the HTML report files"\
+              "\n-c chart_backend(Optional): svg (default) or cairo"\
+              "\n-w workers(Optional): charts rendered at a time\n")
         sys.exit(0)
 
-    test_start_timestamp = sys.argv[1]
-    dest_dir = sys.argv[2]
+    test_start_timestamp = args[0]
+    dest_dir = args[1]
     if not path.exists(dest_dir) or not access(dest_dir, W_OK):
         print "Specified source_dir '%s' does not exist or insufficient"\
               "permissions accessing the directory." % dest_dir
         sys.exit(0)
-    report_gen = HTMLReportGenerator(test_start_timestamp, dest_dir)
+    report_gen = HTMLReportGenerator(test_start_timestamp, dest_dir,
+                                     options.chart_backend, options.workers)
     report_gen.generate_html_report()
 
 
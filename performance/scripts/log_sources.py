@@ -0,0 +1,373 @@
+"""
+Segments of the Nova service log: the log file, its rotated and compressed
+files.
+
+A log name is a file or a glob pattern matching a rotation set, Eg:
+/var/log/user.log* for user.log, user.log.1, user.log.2.gz ...
+The segments are read oldest first: the highest rotation number first, the
+file without rotation number last. gzip, bz2 and xz segments are decompressed
+as they are read, they are never staged on disk.
+
+The first and last timestamps of each segment are kept in a json index file,
+by path, size and modification time, so a compressed segment is read once to
+find them. The segments out of the time window of the analyzed requests are
+skipped.
+
+LogFollower follows the lines appended to the live log file, across its
+rotations, for the analysis of the requests while the test runs.
+"""
+import bz2
+import json
+import os
+import re
+import subprocess
+import tempfile
+import time
+import zlib
+from glob import glob
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        #xz segments are decompressed by the xz command.
+        lzma = None
+
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+#size of the end of a plain segment read to find its last timestamp.
+TAIL_SIZE = 64 * 1024
+
+#lines of the start of a segment searched for its first timestamp.
+HEAD_LINES = 100
+
+#rotation number and compression extension of a segment file name.
+ROTATION_REGEX = re.compile('\.(?P<number>\d+)(\.(gz|bz2|xz))?$')
+
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz')
+
+#the index files kept in the log dir are not segments of the log.
+INDEX_SUFFIXES = ('.segidx', '.tmp', '.reqidx', '.reqidx-journal')
+
+
+def is_compressed(filename):
+    return filename.endswith(COMPRESSED_EXTENSIONS)
+
+
+def _rotation_key(filename):
+    """Sort key of the segments, oldest first."""
+    mObj = ROTATION_REGEX.search(filename)
+    if mObj:
+        return (0, -int(mObj.group('number')), filename)
+    return (1, os.path.getmtime(filename), filename)
+
+
+def fetch_log_segments(log_name):
+    """
+    Return the segment files of the log name, a file or a glob pattern,
+    oldest first.
+    """
+    if not re.search('[*?[]', log_name):
+        return [log_name]
+    segments = [filename for filename in glob(log_name)
+                if os.path.isfile(filename) and
+                not filename.endswith(INDEX_SUFFIXES)]
+    return sorted(segments, key=_rotation_key)
+
+
+def _new_decompressor(filename):
+    if filename.endswith('.gz'):
+        #gzip header and trailer.
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if filename.endswith('.bz2'):
+        return bz2.BZ2Decompressor()
+    return lzma.LZMADecompressor()
+
+
+def _iter_decompressed_chunks(filename):
+    fp = open(filename, 'rb')
+    try:
+        decompressor = _new_decompressor(filename)
+        while True:
+            data = fp.read(READ_BUFFER_SIZE)
+            if not data:
+                break
+            while data:
+                chunk = decompressor.decompress(data)
+                if chunk:
+                    yield chunk
+                #data after the end of a stream is the next stream, Eg: of
+                #concatenated gzip files.
+                data = decompressor.unused_data
+                if data:
+                    decompressor = _new_decompressor(filename)
+    finally:
+        fp.close()
+
+
+def _iter_xz_command_chunks(filename):
+    process = subprocess.Popen(['xz', '-dc', filename],
+                               stdout=subprocess.PIPE)
+    try:
+        while True:
+            chunk = process.stdout.read(READ_BUFFER_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        if process.wait():
+            raise IOError("xz failed to decompress %s" % filename)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def _iter_plain_chunks(filename):
+    fp = open(filename, 'rb')
+    try:
+        while True:
+            chunk = fp.read(READ_BUFFER_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fp.close()
+
+
+def iter_segment_chunks(filename):
+    """Yield the (decompressed) content of the segment, in chunks."""
+    if filename.endswith('.xz') and lzma is None:
+        chunks = _iter_xz_command_chunks(filename)
+    elif is_compressed(filename):
+        chunks = _iter_decompressed_chunks(filename)
+    else:
+        chunks = _iter_plain_chunks(filename)
+    for chunk in chunks:
+        yield chunk
+
+
+def iter_segment_lines(filename):
+    """Yield the raw lines of the segment, decompressed if needed."""
+    if not is_compressed(filename):
+        fp = open(filename, 'rb', READ_BUFFER_SIZE)
+        try:
+            for line in fp:
+                yield line
+        finally:
+            fp.close()
+        return
+    pending = ''
+    for chunk in iter_segment_chunks(filename):
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    if pending:
+        yield pending
+
+
+def iter_log_lines(segments):
+    """Yield the raw lines of the segments, in order."""
+    for segment in segments:
+        for line in iter_segment_lines(segment):
+            yield line
+
+
+class SegmentTimeIndex(object):
+    """
+    The first and last timestamps of the log segments, found with the
+    parse_line_timestamp function (returns None for lines without date) and
+    kept in a json index file when index_filename is given.
+    """
+
+    def __init__(self, parse_line_timestamp, index_filename=None):
+        self.parse_line_timestamp = parse_line_timestamp
+        self.index_filename = index_filename
+        #{segment: [size, mtime, first timestamp, last timestamp]}
+        self.entries = {}
+        if index_filename and os.path.exists(index_filename):
+            try:
+                fp = open(index_filename)
+                try:
+                    self.entries = json.load(fp)
+                finally:
+                    fp.close()
+            except (IOError, ValueError):
+                self.entries = {}
+
+    def _save(self):
+        if not self.index_filename:
+            return
+        tmp_filename = None
+        try:
+            #each process writes its own file, concurrent analyzers may save
+            #the index at the same time.
+            fd, tmp_filename = tempfile.mkstemp(
+                                    prefix=os.path.basename(
+                                        self.index_filename) + '.',
+                                    suffix='.tmp',
+                                    dir=os.path.dirname(os.path.abspath(
+                                        self.index_filename)))
+            #readable by the analyzers of the other users, as the index.
+            os.fchmod(fd, 0644)
+            fp = os.fdopen(fd, 'w')
+            try:
+                json.dump(self.entries, fp)
+            finally:
+                fp.close()
+            os.rename(tmp_filename, self.index_filename)
+        except (IOError, OSError), e:
+            if tmp_filename and os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            print "Unable to save segment index %s: %s" % \
+                  (self.index_filename, e)
+            #the index is kept in memory only.
+            self.index_filename = None
+
+    def _first_timestamp(self, lines):
+        for count, line in enumerate(lines):
+            timestamp = self.parse_line_timestamp(line)
+            if timestamp is not None or count == HEAD_LINES:
+                return timestamp
+        return None
+
+    def _last_timestamp(self, tail):
+        for line in reversed(tail.split('\n')):
+            timestamp = self.parse_line_timestamp(line)
+            if timestamp is not None:
+                return timestamp
+        return None
+
+    def _read_plain_tail(self, segment, size):
+        fp = open(segment, 'rb')
+        try:
+            fp.seek(max(size - TAIL_SIZE, 0))
+            return fp.read()
+        finally:
+            fp.close()
+
+    def _read_compressed_tail(self, segment):
+        #the segment is decompressed once, only its end is kept.
+        tail = ''
+        for chunk in iter_segment_chunks(segment):
+            tail = tail[-TAIL_SIZE:] + chunk
+        return tail
+
+    def time_range(self, segment):
+        """
+        Return the (first, last) timestamps of the segment, None when the
+        timestamps can not be found.
+        """
+        stat = os.stat(segment)
+        entry = self.entries.get(segment)
+        if entry and entry[:2] == [stat.st_size, stat.st_mtime]:
+            return entry[2], entry[3]
+        first = self._first_timestamp(iter_segment_lines(segment))
+        if is_compressed(segment):
+            last = self._last_timestamp(self._read_compressed_tail(segment))
+        else:
+            last = self._last_timestamp(self._read_plain_tail(segment,
+                                                              stat.st_size))
+        self.entries[segment] = [stat.st_size, stat.st_mtime, first, last]
+        self._save()
+        return first, last
+
+    def select(self, segments, time_window):
+        """
+        Return the segments which may have lines in the time window, a
+        (start, end) of timestamps or None for no bound.
+        """
+        start, end = time_window
+        selected = []
+        for segment in segments:
+            first, last = self.time_range(segment)
+            if start is not None and last is not None and last < start:
+                continue
+            if end is not None and first is not None and first > end:
+                continue
+            selected.append(segment)
+        return selected
+
+
+class LogFollower(object):
+    """
+    Follows the lines appended to a log file, like tail -F: when the file is
+    rotated (renamed and replaced by a new file) the rest of the rotated file
+    is read and the new file is followed from its start, when it is
+    truncated in place (Eg: logrotate copytruncate) it is followed from its
+    start again.
+    """
+
+    def __init__(self, filename, poll_interval=0.5, from_end=True):
+        self.filename = filename
+        self.poll_interval = poll_interval
+        #the lines already in the file when following starts are skipped.
+        self.from_end = from_end
+        self.fp = None
+        self.inode = None
+
+    def _open(self):
+        try:
+            self.fp = open(self.filename, 'rb')
+        except IOError:
+            return False
+        self.inode = os.fstat(self.fp.fileno()).st_ino
+        if self.from_end:
+            self.fp.seek(0, os.SEEK_END)
+            self.from_end = False
+        return True
+
+    def _is_rotated(self):
+        """Return True when the followed file is replaced by a new file."""
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            #the new file is not created yet.
+            return False
+        if stat.st_ino != self.inode:
+            return True
+        if stat.st_size < self.fp.tell():
+            #truncated in place, the lines written since are at its start.
+            self.fp.seek(0)
+        return False
+
+    def lines(self, stopped=None):
+        """
+        Yield the raw lines appended to the log till the stopped
+        threading.Event is set. None is yielded each time the log has no new
+        line, so the caller can do its periodic work.
+        """
+        pending = ''
+        try:
+            while stopped is None or not stopped.is_set():
+                if self.fp is None and not self._open():
+                    yield None
+                    time.sleep(self.poll_interval)
+                    continue
+                data = self.fp.read(READ_BUFFER_SIZE)
+                rotated = False
+                if not data and self._is_rotated():
+                    #the writer may have written to the file before it was
+                    #rotated, so it is read till its end once more.
+                    data = self.fp.read()
+                    rotated = True
+                if data:
+                    lines = (pending + data).split('\n')
+                    pending = lines.pop()
+                    for line in lines:
+                        yield line + '\n'
+                if rotated:
+                    if pending:
+                        yield pending
+                        pending = ''
+                    self.fp.close()
+                    self.fp = None
+                elif not data:
+                    yield None
+                    time.sleep(self.poll_interval)
+        finally:
+            if self.fp is not None:
+                self.fp.close()
+                self.fp = None
@@ -29,9 +29,11 @@ except:
     basestring = str
     string = str
 
-class element:
+class element( object ):
     """This class handles the addition of a new element."""
 
+    __slots__ = ( 'tag', 'parent', 'kind', 'open_tag', 'single_tag', 'close_tag' )
+
     def __init__( self, tag, case='lower', parent=None ):
         self.parent = parent
 
@@ -43,58 +45,102 @@ class element:
             self.tag = tag
         else:
             self.tag = tag
+
+        # how the tag is rendered in the parent, looked up once per element
+        if parent is None:
+            self.kind = None
+        elif self.tag in parent.twotags:
+            self.kind = 'two'
+        elif self.tag in parent.onetags:
+            self.kind = 'one'
+        elif parent.mode == 'strict_html' and self.tag in parent.deptags:
+            self.kind = 'deprecated'
+        else:
+            self.kind = 'invalid'
+
+        # tags without attributes are rendered from these
+        self.open_tag = "<%s>" % self.tag
+        self.single_tag = "<%s />" % self.tag
+        self.close_tag = "</%s>" % self.tag
     
     def __call__( self, *args, **kwargs ):
         if len( args ) > 1:
             raise ArgumentError( self.tag )
 
+        parent = self.parent
         # if class_ was defined in parent it should be added to every element
-        if self.parent is not None and self.parent.class_ is not None:
+        if parent is not None and parent.class_ is not None:
             if 'class_' not in kwargs:
-                kwargs['class_'] = self.parent.class_
+                kwargs['class_'] = parent.class_
             
-        if self.parent is None and len( args ) == 1:
+        if parent is None and len( args ) == 1:
             x = [ self.render( self.tag, False, myarg, mydict ) for myarg, mydict in _argsdicts( args, kwargs ) ]
             return '\n'.join( x )
-        elif self.parent is None and len( args ) == 0:
+        elif parent is None and len( args ) == 0:
             x = [ self.render( self.tag, True, myarg, mydict ) for myarg, mydict in _argsdicts( args, kwargs ) ]
             return '\n'.join( x )
-            
-        if self.tag in self.parent.twotags:
-            for myarg, mydict in _argsdicts( args, kwargs ):
-                self.render( self.tag, False, myarg, mydict )
-        elif self.tag in self.parent.onetags:
-            if len( args ) == 0:
-                for myarg, mydict in _argsdicts( args, kwargs ):
-                    self.render( self.tag, True, myarg, mydict )    # here myarg is always None, because len( args ) = 0
-            else:
+
+        kind = self.kind
+        if kind == 'two':
+            single = False
+        elif kind == 'one':
+            if len( args ) != 0:
                 raise ClosingError( self.tag )
-        elif self.parent.mode == 'strict_html' and self.tag in self.parent.deptags:
+            single = True   # here myarg is always None, because len( args ) = 0
+        elif kind == 'deprecated':
             raise DeprecationError( self.tag )
         else:
-            raise InvalidElementError( self.tag, self.parent.mode )
+            raise InvalidElementError( self.tag, parent.mode )
+
+        # fast path for a single element: the argument and the keyword values
+        # are strings, numbers or None
+        if args:
+            between = _toscalar( args[0] )
+        else:
+            between = None
+        if between is not _NOT_SCALAR:
+            mydict = { }
+            for key, value in kwargs.items( ):
+                value = _toscalar( value )
+                if value is _NOT_SCALAR:
+                    break
+                mydict[ key ] = value
+            else:
+                self.render( self.tag, single, between, mydict )
+                return
+
+        for myarg, mydict in _argsdicts( args, kwargs ):
+            self.render( self.tag, single, myarg, mydict )
     
     def render( self, tag, single, between, kwargs ):
         """Append the actual tags to content."""
 
-        out = "<%s" % tag
-        for key, value in list( kwargs.items( ) ):
-            if value is not None:               # when value is None that means stuff like <... checked>
-                key = key.strip('_')            # strip this so class_ will mean class, etc.
-                if key == 'http_equiv':         # special cases, maybe change _ to - overall?
-                    key = 'http-equiv'
-                elif key == 'accept_charset':
-                    key = 'accept-charset'
-                out = "%s %s=\"%s\"" % ( out, key, escape( value ) )
+        if not kwargs and tag == self.tag:
+            if between is not None:
+                out = "%s%s%s" % ( self.open_tag, between, self.close_tag )
+            elif single:
+                out = self.single_tag
             else:
-                out = "%s %s" % ( out, key )
-        if between is not None:
-            out = "%s>%s</%s>" % ( out, between, tag )
+                out = self.open_tag
         else:
-            if single:
-                out = "%s />" % out
+            out = [ "<", tag ]
+            for key, value in list( kwargs.items( ) ):
+                if value is not None:               # when value is None that means stuff like <... checked>
+                    key = key.strip('_')            # strip this so class_ will mean class, etc.
+                    if key == 'http_equiv':         # special cases, maybe change _ to - overall?
+                        key = 'http-equiv'
+                    elif key == 'accept_charset':
+                        key = 'accept-charset'
+                    out.append( " %s=\"%s\"" % ( key, escape( value ) ) )
+                else:
+                    out.append( " %s" % key )
+            if between is not None:
+                out.append( ">%s</%s>" % ( between, tag ) )
+            elif single:
+                out.append( " />" )
             else:
-                out = "%s>" % out
+                out.append( ">" )
+            out = ''.join( out )
         if self.parent is not None:
             self.parent.content.append( out )
         else:
@@ -103,17 +149,17 @@ class element:
     def close( self ):
         """Append a closing tag unless element has only opening tag."""
 
-        if self.tag in self.parent.twotags:
-            self.parent.content.append( "</%s>" % self.tag )
-        elif self.tag in self.parent.onetags:
+        if self.kind == 'two':
+            self.parent.content.append( self.close_tag )
+        elif self.kind == 'one':
             raise ClosingError( self.tag )
-        elif self.parent.mode == 'strict_html' and self.tag in self.parent.deptags:
+        elif self.kind == 'deprecated':
             raise DeprecationError( self.tag )
 
     def open( self, **kwargs ):
         """Append an opening tag."""
 
-        if self.tag in self.parent.twotags or self.tag in self.parent.onetags:
+        if self.kind == 'two' or self.kind == 'one':
             self.render( self.tag, False, None, kwargs )
         elif self.mode == 'strict_html' and self.tag in self.parent.deptags:
             raise DeprecationError( self.tag )
@@ -195,7 +241,10 @@ class page:
     def __getattr__( self, attr ):
         if attr.startswith("__") and attr.endswith("__"):
             raise AttributeError( attr )
-        return element( attr, case=self.case, parent=self )
+        # the element is kept as an attribute, so it is created once per tag
+        myelement = element( attr, case=self.case, parent=self )
+        self.__dict__[ attr ] = myelement
+        return myelement
 
     def __str__( self ):
         
@@ -392,6 +441,20 @@ def _argsdicts( args, mydict ):
 
         yield thisarg, thisdict
 
+_NOT_SCALAR = object( )
+
+def _toscalar( x ):
+    """Utility stuff to convert string, int, float or None to the only value of _totuple( x ),
+    returns _NOT_SCALAR for anything else."""
+
+    if isinstance( x, basestring ):
+        return x
+    elif isinstance( x, ( int, float ) ):
+        return str( x )
+    elif x is None:
+        return None
+    return _NOT_SCALAR
+
 def _totuple( x ):
     """Utility stuff to convert string, int, float, None or anything to a usable tuple."""
 
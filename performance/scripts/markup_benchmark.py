@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of the markup.py HTML generation of the report pages.
+
+Builds and renders a page with a table of <rows> x <columns> cells, with
+markup.py (after) and with another version of it (before), eg. the one of
+an older revision:
+git show <revision>:performance/scripts/markup.py > /tmp/markup_before.py
+
+Usage:
+python markup_benchmark.py <markup_before.py> [-r <rows>] [-c <columns>]
+[-n <repeat>]
+"""
+import imp
+import sys
+import time
+import markup
+from optparse import OptionParser
+
+
+def _time_ms(func, repeat):
+    """Return the average time in ms taken by a call of func."""
+    start = time.time()
+    for i in xrange(repeat):
+        func()
+    return (time.time() - start) * 1E3 / repeat
+
+
+def build_table_page(markup_module, rows, columns):
+    """Return the html of a tabular report page, as the report generators
+    created it with markup."""
+    page = markup_module.page()
+    page.init(title="Jenkins")
+    page.h1("Performance report - benchmark",
+            style="font-family:Verdana,sans-serif; font-size:18pt")
+    page.hr()
+    page.table(border="2", cellspacing="0", cellpadding="4", width="50%",
+               style="font-family:Verdana, sans-serif; text-align:left")
+    for column in xrange(columns):
+        page.th("column %d" % column)
+    for row in xrange(rows):
+        page.tr()
+        for column in xrange(columns):
+            page.td(row * columns + column)
+        page.tr.close()
+    page.table.close()
+    return str(page)
+
+
+def create_options(parser):
+    """Set up the options that may be parsed as program commands."""
+    parser.add_option('-r', '--rows', default=10000, type="int",
+                      action="store", help="Number of table rows")
+    parser.add_option('-c', '--columns', default=10, type="int",
+                      action="store", help="Number of table columns")
+    parser.add_option('-n', '--repeat', default=5, type="int",
+                      action="store", help="Number of timed repetitions")
+
+
+def main():
+    oparser = OptionParser()
+    create_options(oparser)
+    (options, args) = oparser.parse_args(sys.argv[1:])
+    if not args:
+        print __doc__
+        sys.exit(0)
+
+    markup_before = imp.load_source('markup_before', args[0])
+    if build_table_page(markup_before, 10, options.columns) != \
+       build_table_page(markup, 10, options.columns):
+        print "The pages generated by the two versions are different"
+        sys.exit(1)
+    print "Table of %d x %d cells, ms per page" % (options.rows,
+                                                   options.columns)
+    print "%-12s %12s %12s" % ('name', 'before', 'after')
+    print "%-12s %12.2f %12.2f" % ('page',
+        _time_ms(lambda: build_table_page(markup_before, options.rows,
+                                          options.columns), options.repeat),
+        _time_ms(lambda: build_table_page(markup, options.rows,
+                                          options.columns), options.repeat))
+
+
+if __name__ == '__main__':
+    main()
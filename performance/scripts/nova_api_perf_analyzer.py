@@ -3,17 +3,47 @@
 A script that analyzes Nova API performance.
 
 Assumption:
-The Nova services are configured for centralized logging using the syslog tool.
+The Nova services are configured for centralized logging using the syslog tool,
+or log to separate files (Eg: on separate hosts) given as a comma separated
+list of log sources, each one with an optional clock offset in milliseconds:
+-l /logs/api/nova-api.log,/logs/compute1/nova-compute.log@-1500
+The request logs of the sources are merged in timestamp order.
 
 Usage:
 python nova_api_perf_analyzer.py <api_name> <request_id> <tenant_id> <user_id>
-<thread_group> [<log_filename>]
+<thread_group> <test_start_time> [<instance_type>] [-l <log_filename>] [-i]
+[-q]
+
+With -q the request is queued in the analysis job queue of the results file
+dir and analyzed later by the drain usage, which waits till the queue is empty:
+python nova_api_perf_analyzer.py -d [-w <workers>] [-l <log_filename>] [-i]
+
+Batch usage (the log is read only once for all the requests):
+python nova_api_perf_analyzer.py -b <manifest_csv> <test_start_time>
+[-l <log_filename>]
+
+Each row of the manifest csv is
+<api_name>,<request_id>,<tenant_id>,<user_id>,<thread_group>,<instance_type>
+
+The log may be rotated during the test, <log_filename> is then a glob pattern
+of the rotated files, gzip, bz2 and xz files are read as they are, Eg:
+-l '/var/log/user.log*' (see log_sources.py)
+
+The requests may also be analyzed while the test runs, as their logs are
+written, see LiveAnalyzer and the -f option of
+nova_api_perf_analyzer_daemon.py.
 """
+import csv
 import gettext
+import multiprocessing
 import os
 import sys
+import threading
 import time
+import traceback
+import log_sources
 import utils
+from collections import OrderedDict
 from optparse import OptionParser
 
 
@@ -21,31 +51,98 @@ from optparse import OptionParser
 DATETIME_REGEX = '(?P<date_time>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})'
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
 
+#number of results records buffered per results file before writing them.
+RESULTS_BUFFER_SIZE = 1000
+
+#number of queued jobs claimed at a time by drain_queue().
+DRAIN_BATCH_SIZE = 100
+
+#seconds between two evictions of the stale requests of LiveAnalyzer.
+EVICTION_INTERVAL = 1
+
 gettext.install('nova_api_perf_analyzer', unicode=1)
 
 
+def create_log_analyzer(log_name, config, index_log=False):
+    """
+    Return the LogAnalyzer of the Nova service logs, see
+    utils.parse_log_sources for the log sources of log_name.
+    """
+    log_analyzer = None
+    for source_name, clock_offset in utils.parse_log_sources(log_name):
+        index_filename = None
+        if index_log:
+            index_filename = config.get_log_index_filename(source_name)
+        segment_index_filename = config.get_segment_index_filename(
+                                                            source_name)
+        if log_analyzer is None:
+            log_analyzer = utils.LogAnalyzer(source_name, DATETIME_REGEX,
+                                DATE_FORMAT, index_filename=index_filename,
+                                scan_workers=config.log_scan_workers,
+                                time_window=config.log_time_window,
+                                segment_index_filename=segment_index_filename,
+                                clock_offset=clock_offset)
+        else:
+            log_analyzer.add_log_source(source_name, index_filename,
+                                        segment_index_filename, clock_offset)
+    return log_analyzer
+
+
+#whether fetch_request_output_format() warned about the col format.
+_col_format_warned = []
+
+
+def fetch_request_output_format(config):
+    """
+    Return the results file format of the analyzers which write their
+    results after each request. A columnar file would hold a row group, with
+    its own schema header, per result row, so csv is written instead of col,
+    which is written by the batch analysis only.
+    """
+    if config.result_file_format != 'col':
+        return config.result_file_format
+    if not _col_format_warned:
+        print _("result_file_format=col is written by the batch analysis "
+                "(-b) only, the results are written to csv files.")
+        _col_format_warned.append(True)
+    return 'csv'
+
+
+class RequestLogsNotAvailable(Exception):
+    """Raised when the logs of the analyzed request are not available."""
+    pass
+
+
 class NovaAPIAnalyzer(object):
     def __init__(self, api, request_id, tenant_id, user_id, thread_group,
-                 test_start_ms, instance_type, log_name, output_format='csv'):
+                 test_start_ms, instance_type, log_name, output_format=None,
+                 request_logs=None, config=None, index_log=False,
+                 log_analyzer=None, result_loggers=None,
+                 request_context=None):
         self.api = api
         self.request_id = request_id.strip()
         self.tenant_id = tenant_id
         self.user_id = user_id
         self.thread_group = thread_group
-        self.config = utils.PerfAnalyzerConfig()
+        #logs of the request, when already fetched by the caller.
+        self.request_logs = request_logs
+        #RequestLogContext of the request, see fetch_request_context().
+        self.request_context = request_context
+        self.config = config or utils.PerfAnalyzerConfig()
         self.results_dir = os.path.join(self.config.result_file_dir,\
                                         test_start_ms,
                                         "stats")
-        if not os.path.exists(self.results_dir):
-            os.makedirs(self.results_dir)
-        self.output_format = output_format
+        utils.ensure_dir(self.results_dir)
+        self.output_format = output_format or self.config.result_file_format
         self.instance_type = instance_type
-        results_file = self._get_results_filename()
-        self.result_logger = utils.PerfResultsLogger(output_format,
-                                                     results_file)
-        self.log_analyzer = utils.LogAnalyzer(log_name,
-                                              DATETIME_REGEX,
-                                              DATE_FORMAT)
+        #results loggers by file name, may be shared by several analyzers.
+        self.result_loggers = result_loggers
+        if self.result_loggers is None:
+            self.result_loggers = {}
+        self.result_logger = self._get_result_logger(
+                                    self._get_results_filename())
+        self.log_analyzer = log_analyzer or create_log_analyzer(log_name,
+                                                    self.config, index_log)
 
     def _get_results_filename(self):
         """Return the master results file name."""
@@ -61,6 +158,20 @@ class NovaAPIAnalyzer(object):
                    service_name + "." + self.output_format
         return os.path.join(self.results_dir, filename)
 
+    def _get_result_logger(self, filename):
+        """Return the buffered results logger of the file."""
+        result_logger = self.result_loggers.get(filename)
+        if result_logger is None:
+            result_logger = utils.PerfResultsLogger(self.output_format,
+                                    filename, RESULTS_BUFFER_SIZE)
+            self.result_loggers[filename] = result_logger
+        return result_logger
+
+    def flush_results(self):
+        """Write the buffered results of the analyzed requests."""
+        for result_logger in self.result_loggers.itervalues():
+            result_logger.flush()
+
     def _get_common_result_fields(self):
         """Return fields and values common to result log record."""
         result_dict = {'request_id': self.request_id,
@@ -98,8 +209,7 @@ class NovaAPIAnalyzer(object):
     def log_service_result(self, service_name, metrics):
         """Logs the function level time breakdown for service"""
         filename = self._get_service_results_filename(service_name)
-        result_logger = utils.PerfResultsLogger(self.output_format,
-                                                filename)
+        result_logger = self._get_result_logger(filename)
         result_record, ordered_fields = self._get_common_result_fields()
         result_record.update(metrics['task_time'])
         ordered_fields_list = self._fetch_service_tasks(service_name)
@@ -114,13 +224,23 @@ class NovaAPIAnalyzer(object):
             service_time += metrics[task]
         return service_time
 
+    def fetch_request_context(self):
+        """
+        Return the logs of the request with their parsed fields, the log is
+        read only once for all the lookups of the request.
+        """
+        if self.request_context is None:
+            self.request_context = self.log_analyzer.fetch_request_context(
+                                        self.request_id, self.request_logs)
+        return self.request_context
+
     def fetch_metrics(self, server_logs):
-        metrics = self.log_analyzer.fetch_request_metrics(self.request_id,
-                                                     server_logs)
+        metrics = self.log_analyzer.fetch_request_metrics(
+                            self.request_id, server_logs,
+                            context=self.fetch_request_context())
         if not metrics:
             msg = _("Request-id '%s' logs not available" % self.request_id)
-            print msg
-            sys.exit(1)
+            raise RequestLogsNotAvailable(msg)
         return metrics
 
     def analyze_logs(self):
@@ -208,13 +328,16 @@ class CreateServerAnalyzer(NovaAPIAnalyzer):
         compute_name_regex = "^\S{3}\s+\d{1,2} \d{2}\:\d{2}\:\d{2} "\
                              "(?P<compute_name>[\S]+) [\s\S]+ spawned "\
                              "successfully"
-        log_parser = self.log_analyzer.log_parser
-        match_obj = log_parser.fetch_regex_value(self.request_id,
-                                                 compute_name_regex)
-        compute_name = 'Not Available'
-        if match_obj:
-            compute_name = match_obj.group('compute_name')
-        return compute_name
+        context = self.fetch_request_context()
+        compute_name = None
+        #the boot task is logged on the compute server.
+        if 'boot' in context.task_lines:
+            compute_name = context.hostname(context.task_lines['boot'])
+        if not compute_name:
+            match_obj = context.search(compute_name_regex)
+            if match_obj:
+                compute_name = match_obj.group('compute_name')
+        return compute_name or 'Not Available'
 
     def _fetch_nova_api_tasks(self):
         return ['routing', 'check_params', 'start_bdm', 'create_db_entry']
@@ -399,17 +522,426 @@ APIS = {
     'delete': DeleteServerAnalyzer,
     'snapshot': CreateSnapshotAnalyzer}
 
+#compile the task log patterns of each analyzer once, when it is loaded.
+for analyzer_class in APIS.itervalues():
+    analyzer_class.task_patterns = utils.compile_task_patterns(
+                                        analyzer_class.server_logs,
+                                        DATETIME_REGEX)
+
 
 def create_options(parser):
     """Set up the options that may be parsed as program commands."""
     parser.add_option('-l', '--log_name', default="/var/log/syslog",
-                      action="store", help="Nova service log file path")
+                      action="store", help="Nova service log file path, or "
+                           "glob pattern of the rotated log files, or comma "
+                           "separated list of the log sources")
+    parser.add_option('-b', '--batch', default=None, action="store",
+                      help="Manifest csv of the requests to analyze in a "
+                           "single pass over the log")
+    parser.add_option('-i', '--index_log', default=False, action="store_true",
+                      help="Look up the request logs through a persistent "
+                           "request id index of the log file")
+    parser.add_option('-q', '--queue', default=False, action="store_true",
+                      help="Queue the request in the analysis job queue "
+                           "instead of analyzing it")
+    parser.add_option('-d', '--drain', default=False, action="store_true",
+                      help="Analyze the queued requests and wait till the "
+                           "job queue is empty")
+    parser.add_option('-w', '--workers', default=None, type="int",
+                      action="store", help="Number of processes analyzing "
+                           "the queued requests")
+
+
+def validate_request(api, instance_type):
+    """Return the error message for an invalid analysis request or None."""
+    if api not in APIS:
+        return _("Unknown API %s") % api
+    if api == 'create' and not instance_type:
+        return _("Instance type is mandatory for Create Server API.")
+    return None
+
+
+def analyze_request(params, log_name, config=None, log_analyzer=None,
+                    index_log=False):
+    """Analyze the request of the analysis job parameters."""
+    api = params['api']
+    instance_type = params.get('instance_type') if api == 'create' else None
+    config = config or utils.PerfAnalyzerConfig()
+    analyzer = APIS[api](api, params['request_id'], params['tenant_id'],
+                         params['user_id'], params['thread_group'],
+                         params['test_start_time'], instance_type,
+                         log_name=log_name,
+                         output_format=fetch_request_output_format(config),
+                         config=config, index_log=index_log,
+                         log_analyzer=log_analyzer)
+    try:
+        analyzer.analyze_logs()
+    finally:
+        analyzer.flush_results()
+
+
+#log analyzer of a worker pool process, see _init_worker().
+_worker_context = {}
+
+
+def _init_worker(log_name, index_log):
+    config = utils.PerfAnalyzerConfig()
+    _worker_context.update(log_name=log_name, config=config,
+                           log_analyzer=create_log_analyzer(log_name, config,
+                                                            index_log))
+
+
+def _analyze_job(job):
+    """Analyze a queued job in a worker process, returns (job id, error)."""
+    job_id, params = job
+    try:
+        analyze_request(params, **_worker_context)
+    except RequestLogsNotAvailable, e:
+        return job_id, unicode(e)
+    except Exception:
+        return job_id, traceback.format_exc()
+    return job_id, None
+
+
+def create_worker_pool(log_name, index_log=False, workers=None):
+    """Return the pool of processes analyzing the queued jobs."""
+    return multiprocessing.Pool(workers, _init_worker, (log_name, index_log))
+
+
+def drain_queue(job_queue, pool):
+    """
+    Analyze the queued jobs in the worker pool till the queue is empty.
+    Returns the count of the analyzed and the failed jobs.
+    """
+    analyzed = failed = 0
+    while True:
+        jobs = job_queue.claim(DRAIN_BATCH_SIZE)
+        if not jobs:
+            return analyzed, failed
+        for job_id, error in pool.imap_unordered(_analyze_job, jobs):
+            job_queue.finish(job_id, failed=error is not None)
+            if error is None:
+                analyzed += 1
+            else:
+                print error
+                failed += 1
+
+
+def read_manifest(manifest_file):
+    """Return the list of request rows from the batch manifest csv."""
+    fp = open(manifest_file, 'rb')
+    rows = [row for row in csv.reader(fp) if row]
+    fp.close()
+    return rows
+
+
+def analyze_batch(manifest_file, test_start_ms, log_name):
+    """
+    Analyze all the requests of the manifest, reading the log only once.
+    Returns the count of requests which could not be analyzed.
+    """
+    rows = read_manifest(manifest_file)
+    config = utils.PerfAnalyzerConfig()
+    log_analyzer = create_log_analyzer(log_name, config)
+    request_ids = [row[1].strip() for row in rows]
+    request_contexts = log_analyzer.fetch_requests_contexts(request_ids)
+    if request_contexts is False:
+        return len(rows)
+
+    failed = 0
+    #the results of all the requests are buffered and written at the end.
+    result_loggers = {}
+    try:
+        for row in rows:
+            api = row[0]
+            instance_type = None
+            if api == 'create' and len(row) > 5:
+                instance_type = row[5]
+            error = validate_request(api, instance_type)
+            if error:
+                print error
+                failed += 1
+                continue
+            request_id = row[1].strip()
+            analyzer = APIS[api](api, request_id, row[2], row[3], row[4],
+                                 test_start_ms, instance_type,
+                                 log_name=log_name, config=config,
+                                 log_analyzer=log_analyzer,
+                                 result_loggers=result_loggers,
+                                 request_context=request_contexts[request_id])
+            try:
+                analyzer.analyze_logs()
+            except RequestLogsNotAvailable, e:
+                print e
+                failed += 1
+            except Exception:
+                #a malformed request does not stop the batch.
+                print traceback.format_exc()
+                failed += 1
+    finally:
+        #the results of the requests analyzed before an error are kept.
+        for result_logger in result_loggers.itervalues():
+            result_logger.flush()
+    return failed
+
+
+def _match_task(task_pattern, line):
+    """Return True if the line logs the task of the compiled task pattern."""
+    task, log_msg, pattern, literal = task_pattern
+    return (not literal or literal in line) and \
+           pattern.search(line) is not None
+
+
+def detect_api(line):
+    """Return the API of the request whose first log message is the line."""
+    for api, analyzer_class in APIS.iteritems():
+        if _match_task(analyzer_class.task_patterns[0], line):
+            return api
+    return None
+
+
+class RequestTracker(object):
+    """
+    The state machine of the tasks (server_logs) of a followed request and
+    the log messages of the request.
+    """
+
+    def __init__(self, request_id, api):
+        self.request_id = request_id
+        self.api = api
+        self.request_logs = []
+        #index of the next task of the API.
+        self.state = 0
+        self.finished = False
+        self.last_seen = time.time()
+
+    def feed(self, line):
+        """
+        Advance the state machine on a log message of the request, returns
+        True when the final task of the API is logged.
+        """
+        self.request_logs.append(line)
+        self.last_seen = time.time()
+        task_patterns = APIS[self.api].task_patterns
+        while self.state < len(task_patterns) and \
+              _match_task(task_patterns[self.state], line):
+            self.state += 1
+        #a missing task does not hold the request, its time is 0 as in the
+        #analysis of the whole log.
+        if self.state == len(task_patterns) or \
+           _match_task(task_patterns[-1], line):
+            self.finished = True
+        return self.finished
+
+
+class LiveAnalyzer(object):
+    """
+    Analyzes the requests while the test runs, as the Nova service log is
+    written (see log_sources.LogFollower).
+
+    Each log message of a request id advances the task state machine of the
+    request (see RequestTracker), the API of the request is the one whose
+    first task is logged by its first message, or the API it is registered
+    with. When the final task of a request is logged and the request is
+    registered with its analysis parameters (see register), its results are
+    written at once, with the log messages kept by the state machine. The
+    messages of a request logged after its final task are not analyzed, so
+    its api_response_time ends at the final task.
+
+    The requests which are not finished and registered within
+    request_timeout seconds are evicted, as the oldest ones beyond
+    max_requests, so the memory use is bounded.
+
+    A single log source is followed, the logs of all the Nova services are
+    expected in it (Eg: centralized syslog).
+    """
+
+    def __init__(self, log_name, config=None, request_timeout=None,
+                 max_requests=None):
+        if len(utils.parse_log_sources(log_name)) > 1:
+            #the tasks of a request logged by the other sources would never
+            #be seen, and every request evicted.
+            raise ValueError(_("The live analysis follows a single log "
+                               "source, not '%s'.") % log_name)
+        self.config = config or utils.PerfAnalyzerConfig()
+        self.log_name = log_name
+        self.log_analyzer = create_log_analyzer(log_name, self.config)
+        self.request_timeout = request_timeout or \
+                               self.config.live_request_timeout
+        self.max_requests = max_requests or self.config.live_max_requests
+        self.output_format = fetch_request_output_format(self.config)
+        #{request id: RequestTracker}, oldest first.
+        self.trackers = OrderedDict()
+        #{request id: (analysis parameters, registration time)} of the
+        #registered requests which are not analyzed yet.
+        self.params = OrderedDict()
+        self.result_loggers = {}
+        self.analyzed = 0
+        self.failed = 0
+        self.evicted = 0
+        self.last_eviction = time.time()
+        #held by the follower and by the callers of register and drain.
+        self.condition = threading.Condition()
+
+    def fetch_followed_file(self):
+        """Return the live file of the log source, its newest segment."""
+        source_name = utils.parse_log_sources(self.log_name)[0][0]
+        segments = log_sources.fetch_log_segments(source_name)
+        if not segments:
+            #the log is not created yet.
+            return source_name
+        return segments[-1]
+
+    def register(self, params):
+        """Register the analysis parameters of a request."""
+        request_id = params['request_id'].strip()
+        self.condition.acquire()
+        try:
+            tracker = self.trackers.get(request_id)
+            if tracker is not None and tracker.finished:
+                del self.trackers[request_id]
+                self._analyze(tracker, params)
+                return
+            if tracker is None:
+                #the logs of the request are not written yet.
+                self.trackers[request_id] = RequestTracker(request_id,
+                                                           params['api'])
+            self.params[request_id] = (params, time.time())
+        finally:
+            self.condition.release()
+
+    def process_line(self, line, encoding="utf-8"):
+        """Advance the state machines of the requests logged by the line."""
+        request_ids = set(utils.REQUEST_ID_REGEX.findall(line))
+        if not request_ids:
+            return
+        line = line.decode(encoding, "replace")
+        self.condition.acquire()
+        try:
+            for request_id in request_ids:
+                tracker = self.trackers.get(request_id)
+                if tracker is None:
+                    #only the requests whose first task is logged are
+                    #followed, not the messages of any request id.
+                    api = detect_api(line)
+                    if api is None:
+                        continue
+                    tracker = RequestTracker(request_id, api)
+                    self.trackers[request_id] = tracker
+                elif tracker.finished:
+                    continue
+                if tracker.feed(line) and request_id in self.params:
+                    params = self.params.pop(request_id)[0]
+                    del self.trackers[request_id]
+                    self._analyze(tracker, params)
+        finally:
+            self.condition.release()
+
+    def _analyze(self, tracker, params):
+        """Write the results of the finished request."""
+        api = params['api']
+        instance_type = params.get('instance_type') if api == 'create' \
+                        else None
+        context = self.log_analyzer.fetch_request_context(
+                        tracker.request_id, tracker.request_logs)
+        try:
+            analyzer = APIS[api](api, tracker.request_id, params['tenant_id'],
+                                 params['user_id'], params['thread_group'],
+                                 params['test_start_time'], instance_type,
+                                 log_name=self.log_name,
+                                 output_format=self.output_format,
+                                 config=self.config,
+                                 log_analyzer=self.log_analyzer,
+                                 result_loggers=self.result_loggers,
+                                 request_context=context)
+            analyzer.analyze_logs()
+            analyzer.flush_results()
+            self.analyzed += 1
+        except RequestLogsNotAvailable, e:
+            print e
+            self.failed += 1
+        except Exception:
+            print traceback.format_exc()
+            self.failed += 1
+        self.condition.notifyAll()
+
+    def evict(self):
+        """Evict the stale requests and the oldest ones beyond max_requests."""
+        self.condition.acquire()
+        try:
+            now = time.time()
+            self.last_eviction = now
+            deadline = now - self.request_timeout
+            for request_id, tracker in self.trackers.items():
+                if tracker.last_seen >= deadline and \
+                   len(self.trackers) <= self.max_requests:
+                    continue
+                del self.trackers[request_id]
+                self.evicted += 1
+                if request_id in self.params:
+                    del self.params[request_id]
+                    print _("Request-id '%s' logs not available") % \
+                          request_id
+                    self.failed += 1
+            self.condition.notifyAll()
+        finally:
+            self.condition.release()
+
+    def follow(self, stopped=None):
+        """
+        Analyze the requests logged in the live log file till the stopped
+        threading.Event is set.
+        """
+        follower = log_sources.LogFollower(self.fetch_followed_file())
+        for line in follower.lines(stopped):
+            if line is not None:
+                self.process_line(line)
+            if time.time() - self.last_eviction >= EVICTION_INTERVAL:
+                self.evict()
+
+    def drain(self):
+        """
+        Wait till the registered requests are analyzed or evicted, returns
+        the count of the analyzed and the failed requests.
+        """
+        self.condition.acquire()
+        try:
+            while self.params:
+                self.condition.wait(1)
+            return self.analyzed, self.failed
+        finally:
+            self.condition.release()
 
 
 def main():
     oparser = OptionParser()
     create_options(oparser)
     (options, args) = oparser.parse_args(sys.argv[1:])
+    if options.drain:
+        config = utils.PerfAnalyzerConfig()
+        job_queue = utils.AnalysisJobQueue(config.get_job_queue_filename())
+        #jobs left running by a drain which was stopped.
+        job_queue.recover()
+        pool = create_worker_pool(options.log_name, options.index_log,
+                                  options.workers or config.analyzer_workers)
+        analyzed, failed = drain_queue(job_queue, pool)
+        pool.close()
+        pool.join()
+        print _("Analyzed %(analyzed)d requests, %(failed)d failed") % \
+              {'analyzed': analyzed, 'failed': failed}
+        if failed:
+            sys.exit(1)
+        return
+
+    if options.batch:
+        if not args:
+            print _("Test start time is mandatory for batch analysis.")
+            sys.exit(0)
+        failed = analyze_batch(options.batch, args[0], options.log_name)
+        if failed:
+            sys.exit(1)
+        return
+
     if not args or len(args) < 6:
         print _("API name, request id, tenant_id, user_id, thread_group and "\
                 "test start time are mandatory.")
@@ -426,10 +958,20 @@ def main():
         instance_type = args[6]
     else:
         instance_type = None
-    #create the APIAnalyzer object and call analyze_logs( ) method.
-    analyzer = APIS[api](api, args[1], args[2], args[3], args[4], args[5],
-                         instance_type, log_name=options.log_name)
-    analyzer.analyze_logs()
+    params = {'api': api, 'request_id': args[1], 'tenant_id': args[2],
+              'user_id': args[3], 'thread_group': args[4],
+              'test_start_time': args[5], 'instance_type': instance_type}
+    if options.queue:
+        config = utils.PerfAnalyzerConfig()
+        utils.AnalysisJobQueue(config.get_job_queue_filename()).put(params)
+        return
+
+    try:
+        analyze_request(params, options.log_name,
+                        index_log=options.index_log)
+    except RequestLogsNotAvailable, e:
+        print e
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+A client that submits requests to the resident Nova API performance analyzer
+(nova_api_perf_analyzer_daemon.py).
+
+Usage:
+python nova_api_perf_analyzer_client.py <api_name> <request_id> <tenant_id>
+<user_id> <thread_group> <test_start_time> [<instance_type>]
+[-H <host>] [-p <port>]
+
+Wait till all the submitted requests are analyzed:
+python nova_api_perf_analyzer_client.py --drain [-H <host>] [-p <port>]
+"""
+import sys
+import urllib
+import urllib2
+from optparse import OptionParser
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8780
+
+#names of the analysis request parameters, in command line order.
+REQUEST_PARAMS = ['api', 'request_id', 'tenant_id', 'user_id',
+                  'thread_group', 'test_start_time', 'instance_type']
+
+
+def submit(host, port, params):
+    """Submit an analysis request, returns the analyzer response."""
+    url = "http://%s:%s/analyze?%s" % (host, port, urllib.urlencode(params))
+    return urllib2.urlopen(url).read()
+
+
+def drain(host, port):
+    """Wait till the submitted requests are analyzed."""
+    url = "http://%s:%s/drain" % (host, port)
+    return urllib2.urlopen(url).read()
+
+
+def create_options(parser):
+    """Set up the options that may be parsed as program commands."""
+    parser.add_option('-H', '--host', default=DEFAULT_HOST, action="store",
+                      help="Perf analyzer host")
+    parser.add_option('-p', '--port', default=DEFAULT_PORT, type="int",
+                      action="store", help="Perf analyzer port")
+    parser.add_option('-d', '--drain', default=False, action="store_true",
+                      help="Wait till the submitted requests are analyzed")
+
+
+def main():
+    oparser = OptionParser()
+    create_options(oparser)
+    (options, args) = oparser.parse_args(sys.argv[1:])
+    try:
+        if options.drain:
+            print drain(options.host, options.port)
+            return
+        if len(args) < 6:
+            print __doc__
+            sys.exit(0)
+        params = dict(zip(REQUEST_PARAMS, args))
+        print submit(options.host, options.port, params)
+    except urllib2.HTTPError, e:
+        print e.read()
+        sys.exit(1)
+    except urllib2.URLError, e:
+        print "Unable to reach perf analyzer at %s:%s: %s" % \
+              (options.host, options.port, e.reason)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""
+A resident Nova API performance analyzer.
+
+The requests submitted over HTTP are queued in the analysis job queue of the
+results file dir and analyzed in the background by a pool of worker processes,
+which load the configuration, the compiled task patterns and the log analyzer
+once, so JMeter does not start a Python interpreter for every request.
+
+With -f the log is followed instead, like tail -F, and each submitted request
+is analyzed as soon as its final task is logged (see
+nova_api_perf_analyzer.LiveAnalyzer), so the results are written while the
+test runs. The log is then a single log source, Eg: the centralized syslog.
+
+Usage:
+python nova_api_perf_analyzer_daemon.py [-H <host>] [-p <port>]
+[-l <log_filename>] [-i] [-w <workers>] [-f]
+
+Submit a request for analysis, the response is returned immediately:
+GET /analyze?api=<api_name>&request_id=<request_id>&tenant_id=<tenant_id>
+    &user_id=<user_id>&thread_group=<thread_group>
+    &test_start_time=<test_start_time>[&instance_type=<instance_type>]
+
+Wait till all the submitted requests are analyzed:
+GET /drain
+"""
+import BaseHTTPServer
+import SocketServer
+import sys
+import threading
+import time
+import traceback
+import urlparse
+import nova_api_perf_analyzer
+import utils
+from nova_api_perf_analyzer_client import DEFAULT_HOST, DEFAULT_PORT
+from optparse import OptionParser
+
+
+#seconds to wait before retrying the jobs of a drain which failed.
+RETRY_INTERVAL = 5
+
+
+def validate_params(params):
+    """Return the error message for invalid analysis parameters or None."""
+    for param in ['api', 'request_id', 'tenant_id', 'user_id',
+                  'thread_group', 'test_start_time']:
+        if not params.get(param):
+            return _("Parameter '%s' is mandatory.") % param
+    return nova_api_perf_analyzer.validate_request(
+                params['api'], params.get('instance_type'))
+
+
+class AnalyzerService(object):
+    """Queues the submitted requests and drains the queue in the background."""
+
+    def __init__(self, log_name, index_log=False, workers=None):
+        config = utils.PerfAnalyzerConfig()
+        self.job_queue = utils.AnalysisJobQueue(
+                                config.get_job_queue_filename())
+        #jobs left running when the analyzer was last stopped.
+        self.job_queue.recover()
+        self.log_name = log_name
+        self.index_log = index_log
+        self.workers = workers or config.analyzer_workers
+        self.pool = nova_api_perf_analyzer.create_worker_pool(log_name,
+                        index_log, self.workers)
+        self.analyzed = 0
+        self.failed = 0
+        self.queued = threading.Event()
+        self.drained = threading.Condition()
+        #whether the analyzed jobs are not counted yet.
+        self.draining = False
+        #drain the jobs queued before the analyzer was started.
+        self.queued.set()
+        worker = threading.Thread(target=self._process_jobs)
+        worker.daemon = True
+        worker.start()
+
+    def submit(self, params):
+        """Queue an analysis request, returns the error message if invalid."""
+        error = validate_params(params)
+        if error:
+            return error
+        self.job_queue.put(params)
+        self.queued.set()
+        return None
+
+    def drain(self):
+        """Wait till the queued requests are analyzed."""
+        self.drained.acquire()
+        try:
+            while self.draining or self.job_queue.pending():
+                self.drained.wait(1)
+            return self.analyzed, self.failed
+        finally:
+            self.drained.release()
+
+    def _recover(self):
+        """
+        Queue again the jobs claimed by a drain which failed, and replace the
+        worker pool, which may be broken.
+        """
+        self.pool.terminate()
+        self.pool = nova_api_perf_analyzer.create_worker_pool(self.log_name,
+                        self.index_log, self.workers)
+        self.job_queue.recover()
+
+    def _process_jobs(self):
+        while True:
+            self.queued.wait()
+            self.queued.clear()
+            self.drained.acquire()
+            self.draining = True
+            self.drained.release()
+            try:
+                analyzed, failed = nova_api_perf_analyzer.drain_queue(
+                                        self.job_queue, self.pool)
+            except Exception:
+                #Eg: a lock timeout of the job queue, the jobs are retried.
+                print traceback.format_exc()
+                analyzed = failed = 0
+                time.sleep(RETRY_INTERVAL)
+                try:
+                    self._recover()
+                except Exception:
+                    print traceback.format_exc()
+                self.queued.set()
+            self.drained.acquire()
+            self.analyzed += analyzed
+            self.failed += failed
+            self.draining = False
+            self.drained.notifyAll()
+            self.drained.release()
+
+
+class LiveAnalyzerService(object):
+    """
+    Registers the submitted requests with the live analyzer, which follows
+    the log in the background.
+    """
+
+    def __init__(self, log_name):
+        self.live_analyzer = nova_api_perf_analyzer.LiveAnalyzer(log_name)
+        follower = threading.Thread(target=self.live_analyzer.follow)
+        follower.daemon = True
+        follower.start()
+
+    def submit(self, params):
+        """Register an analysis request, returns the error message or None."""
+        error = validate_params(params)
+        if error:
+            return error
+        self.live_analyzer.register(params)
+        return None
+
+    def drain(self):
+        """Wait till the registered requests are analyzed or evicted."""
+        return self.live_analyzer.drain()
+
+
+class AnalyzerRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def _respond(self, code, message):
+        self.send_response(code)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(message)))
+        self.end_headers()
+        self.wfile.write(message)
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        params = dict([(name, values[-1]) for name, values in
+                       urlparse.parse_qs(url.query).iteritems()])
+        service = self.server.service
+        if url.path == '/analyze':
+            error = service.submit(params)
+            if error:
+                self._respond(400, error.encode('utf-8'))
+            else:
+                self._respond(202, "queued")
+        elif url.path == '/drain':
+            analyzed, failed = service.drain()
+            self._respond(200, "analyzed=%d failed=%d" % (analyzed, failed))
+        else:
+            self._respond(404, "Unknown path %s" % url.path)
+
+    def log_message(self, format, *args):
+        #one line per request would flood the output under load.
+        pass
+
+
+class AnalyzerHTTPServer(SocketServer.ThreadingMixIn,
+                         BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, service):
+        BaseHTTPServer.HTTPServer.__init__(self, address,
+                                           AnalyzerRequestHandler)
+        self.service = service
+
+
+def create_options(parser):
+    """Set up the options that may be parsed as program commands."""
+    nova_api_perf_analyzer.create_options(parser)
+    for option in ['--batch', '--queue', '--drain']:
+        parser.remove_option(option)
+    parser.add_option('-H', '--host', default=DEFAULT_HOST, action="store",
+                      help="Address to listen on")
+    parser.add_option('-p', '--port', default=DEFAULT_PORT, type="int",
+                      action="store", help="Port to listen on")
+    parser.add_option('-f', '--follow', default=False, action="store_true",
+                      help="Follow the log and analyze each request as soon "
+                           "as its final task is logged")
+
+
+def main():
+    oparser = OptionParser()
+    create_options(oparser)
+    (options, args) = oparser.parse_args(sys.argv[1:])
+    if options.follow:
+        try:
+            service = LiveAnalyzerService(options.log_name)
+        except ValueError, e:
+            print e
+            sys.exit(1)
+    else:
+        service = AnalyzerService(options.log_name, options.index_log,
+                                  options.workers)
+    server = AnalyzerHTTPServer((options.host, options.port), service)
+    print _("Nova API perf analyzer listening on %(host)s:%(port)d") % \
+          {'host': options.host, 'port': options.port}
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
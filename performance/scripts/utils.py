@@ -1,98 +1,917 @@
 import ConfigParser
-import codecs
+import bisect
+import calendar
+import columnar_store
 import csv
+import errno
+import fcntl
+import heapq
+import json
+import log_sources
+import mmap
+import multiprocessing
 import os
 import re
+import sqlite3
+from cStringIO import StringIO
 from datetime import datetime, timedelta
 
 
+#request id token as written by the Nova services, Eg: req-<uuid>
+REQUEST_ID_REGEX = re.compile('req-[\w-]+')
+
+#seconds to wait for the lock on the log index held by another process.
+LOG_INDEX_LOCK_TIMEOUT = 600
+
+#compiled task patterns keyed by the task log map and the date regex.
+_task_patterns_cache = {}
+
+#fixed width date format parsed by parse_log_timestamp.
+LOG_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+
+#epoch seconds of the dates parsed by parse_log_timestamp.
+_date_epoch_cache = {}
+
+#characters ending the literal text of a regex.
+REGEX_SPECIAL_CHARS = '.^$*+?{}[]\\|()'
+
+#syslog prefix of a log message, Eg: Mar 12 10:15:01 <hostname> ...
+SYSLOG_HOSTNAME_REGEX = re.compile("^\S{3}\s+\d{1,2} \d{2}\:\d{2}\:\d{2} "
+                                   "(?P<hostname>[\S]+) ")
+
+
+def ensure_dir(path):
+    """Create the directory, unless another process already created it."""
+    try:
+        os.makedirs(path)
+    except OSError, e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
 def convert_timedelta_to_milliseconds(td):
-    """convert timedelta to milliseconds"""
+    """convert timedelta to milliseconds, td may already be milliseconds"""
+    if isinstance(td, (int, long)):
+        return td
     ms = td.days * 86400 * 1E3 + td.seconds * 1E3 + td.microseconds / 1E3
     return int(ms)
 
 
+def convert_datetime_to_milliseconds(dt):
+    """convert datetime to epoch milliseconds"""
+    return calendar.timegm(dt.timetuple()) * 1000 + dt.microsecond / 1000
+
+
+def parse_log_timestamp(value):
+    """
+    Return the epoch milliseconds of a timestamp in LOG_TIMESTAMP_FORMAT,
+    Eg: 2012-03-12 10:15:01,123. The fixed width fields are sliced instead
+    of being parsed with datetime.strptime.
+    """
+    date = value[:10]
+    epoch = _date_epoch_cache.get(date)
+    if epoch is None:
+        epoch = calendar.timegm((int(value[:4]), int(value[5:7]),
+                                 int(value[8:10]), 0, 0, 0))
+        _date_epoch_cache[date] = epoch
+    seconds = epoch + int(value[11:13]) * 3600 + int(value[14:16]) * 60 +\
+              int(value[17:19])
+    #fraction of second, %f accepts up to 6 digits.
+    return seconds * 1000 + int((value[20:26] + "00")[:3])
+
+
+def fetch_timestamp_parser(date_format):
+    """Return the function converting a log timestamp to epoch milliseconds."""
+    if date_format == LOG_TIMESTAMP_FORMAT:
+        return parse_log_timestamp
+
+    def parse_timestamp(value):
+        return convert_datetime_to_milliseconds(
+                    datetime.strptime(value, date_format))
+    return parse_timestamp
+
+
+def parse_log_sources(log_names):
+    """
+    Return the list of (log name, clock offset) of the log sources, a comma
+    separated list of <log file or glob pattern>[@<clock offset>], Eg:
+    /var/log/nova-api.log,/mnt/compute1/nova-compute.log@-1500
+    The clock offset is the number of milliseconds added to the timestamps
+    of the source to align them with the clock of the other sources.
+    """
+    sources = []
+    for source in log_names.split(','):
+        name, separator, offset = source.rpartition('@')
+        if separator and re.match('^[+-]?\d+$', offset):
+            sources.append((name, int(offset)))
+        else:
+            sources.append((source, 0))
+    return sources
+
+
+def _iter_mapped_lines(mapped, pattern, range_start=0, range_end=None):
+    try:
+        size = len(mapped)
+        if range_end is None:
+            range_end = size
+        position = mapped.find(pattern, range_start, range_end)
+        while position != -1:
+            #expand the hit to the boundaries of its line.
+            start = mapped.rfind("\n", 0, position) + 1
+            end = mapped.find("\n", position)
+            if end == -1:
+                end = size
+            else:
+                end += 1
+            yield mapped[start:end]
+            position = mapped.find(pattern, end, range_end)
+    finally:
+        mapped.close()
+
+
+def mmap_find_lines(filename, pattern, range_start=0, range_end=None):
+    """
+    Return an iterator over the raw lines of the file which contain pattern,
+    optionally only the ones in a newline aligned byte range of the file.
+    The file is memory mapped and the pattern is searched in the raw bytes,
+    so only the matching lines are copied out of the mapping.
+    Raises EnvironmentError or ValueError when the file can not be mapped.
+    """
+    fp = open(filename, "rb")
+    try:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        fp.close()
+    return _iter_mapped_lines(mapped, pattern, range_start, range_end)
+
+
+def iter_range_lines(filename, start, end, buffer_size=1024 * 1024):
+    """Yield the raw lines of a newline aligned byte range of the file."""
+    fp = open(filename, "rb", buffer_size)
+    try:
+        fp.seek(start)
+        position = start
+        while position < end:
+            line = fp.readline()
+            if not line:
+                break
+            position += len(line)
+            yield line
+    finally:
+        fp.close()
+
+
+def split_byte_ranges(filename, count):
+    """
+    Split the file in up to count newline aligned (start, end) byte ranges
+    of about the same size.
+    """
+    size = os.path.getsize(filename)
+    ranges = []
+    start = 0
+    fp = open(filename, "rb")
+    try:
+        for number in xrange(1, count):
+            if start >= size:
+                break
+            fp.seek(max(size * number / count, start))
+            #the range ends after the line at the split offset.
+            fp.readline()
+            end = fp.tell()
+            ranges.append((start, end))
+            start = end
+    finally:
+        fp.close()
+    if start < size:
+        ranges.append((start, size))
+    return ranges
+
+
+def collect_requests_logs(lines, request_ids, encoding="utf-8"):
+    """
+    Return the {request id: [log messages]} of the requests, from the raw
+    log lines. Request ids are looked up by hash, the ones not in the request
+    id format fall back to the substring search.
+    """
+    request_logs = {}
+    unindexed_ids = []
+    for request_id in request_ids:
+        request_logs[request_id] = []
+        if not REQUEST_ID_REGEX.match(request_id):
+            unindexed_ids.append(request_id)
+
+    for line in lines:
+        decoded_line = None
+        for token in set(REQUEST_ID_REGEX.findall(line)):
+            if token in request_logs:
+                decoded_line = decoded_line or line.decode(encoding,
+                                                           "replace")
+                request_logs[token].append(decoded_line)
+        for request_id in unindexed_ids:
+            if line.find(request_id) != -1:
+                decoded_line = decoded_line or line.decode(encoding,
+                                                           "replace")
+                request_logs[request_id].append(decoded_line)
+    return request_logs
+
+
+def _scan_byte_range(args):
+    """
+    Return the {request id: [log messages]} of a byte range of the log, run
+    by the ParallelLogScanner worker processes.
+    """
+    filename, start, end, request_ids, encoding = args
+    if end is None:
+        #compressed segment.
+        range_lines = log_sources.iter_segment_lines(filename)
+    else:
+        range_lines = iter_range_lines(filename, start, end)
+    if len(request_ids) != 1:
+        return collect_requests_logs(range_lines, request_ids, encoding)
+
+    #a single request is searched as CustomLogParser.iter_request_logs does.
+    request_id = request_ids[0]
+    pattern = request_id.encode(encoding)
+    lines = None
+    if end is not None:
+        try:
+            lines = mmap_find_lines(filename, pattern, start, end)
+        except (EnvironmentError, ValueError, OverflowError):
+            #the range is read as a stream.
+            pass
+    if lines is None:
+        lines = (line for line in range_lines if pattern in line)
+    return {request_id: [line.decode(encoding, "replace") for line in lines]}
+
+
+class ParallelLogScanner(object):
+    """
+    Scans the log segments on several cores: the segments are split in
+    newline aligned byte ranges, the lines of each range are filtered and
+    decoded by a worker process and the logs of the requests found in the
+    ranges are merged in the order of the ranges, the order of the log.
+    A compressed segment can not be split, it is scanned by a single worker.
+    """
+    #smallest range scanned by a worker, smaller logs use less workers.
+    MIN_RANGE_SIZE = 16 * 1024 * 1024
+
+    def __init__(self, segments, workers=None, encoding="utf-8"):
+        if isinstance(segments, basestring):
+            segments = [segments]
+        self.segments = segments
+        self.workers = workers or multiprocessing.cpu_count()
+        self.encoding = encoding
+
+    def byte_ranges(self):
+        """
+        Return the (segment, start, end) byte ranges scanned by the workers,
+        end is None for a whole compressed segment.
+        """
+        ranges = []
+        for segment in self.segments:
+            if log_sources.is_compressed(segment):
+                ranges.append((segment, 0, None))
+                continue
+            size = os.path.getsize(segment)
+            count = max(min(self.workers, size / self.MIN_RANGE_SIZE), 1)
+            ranges.extend([(segment, start, end) for start, end in
+                           split_byte_ranges(segment, count)])
+        return ranges
+
+    def fetch_requests_logs(self, request_ids):
+        """
+        Return the {request id: [log messages]} of the requests.
+        """
+        request_ids = list(request_ids)
+        jobs = [(segment, start, end, request_ids, self.encoding)
+                for segment, start, end in self.byte_ranges()]
+        #the processes of a pool (Eg: the analyzer workers) can not start
+        #their own pool.
+        if len(jobs) < 2 or multiprocessing.current_process().daemon:
+            results = map(_scan_byte_range, jobs)
+        else:
+            pool = multiprocessing.Pool(len(jobs))
+            try:
+                results = pool.map(_scan_byte_range, jobs, 1)
+            finally:
+                pool.close()
+                pool.join()
+
+        request_logs = dict([(request_id, []) for request_id in request_ids])
+        for range_logs in results:
+            for request_id, logs in range_logs.iteritems():
+                request_logs[request_id].extend(logs)
+        return request_logs
+
+
+def _fetch_required_literal(log_msg):
+    """
+    Return the literal text which every line matching the task log message
+    contains, Eg: ' Making asynchronous call on network' for
+    '%s nova-compute DEBUG [\s\S]+ Making asynchronous call on network'.
+    Returns None when the log message has no such text.
+    """
+    runs = []
+    run = ''
+    index = 0
+    while index < len(log_msg):
+        char = log_msg[index]
+        index += 1
+        if char == '%' and log_msg[index:index + 1] == 's':
+            #date regex placeholder.
+            index += 1
+        elif char == '\\' and index < len(log_msg):
+            if log_msg[index].isalnum():
+                #class (Eg: \S, \d), assertion or backreference, it is not
+                #literal text.
+                index += 1
+            else:
+                #escaped literal char.
+                run += log_msg[index]
+                index += 1
+                continue
+        elif char == '|':
+            #alternatives, no text is required.
+            return None
+        elif char in '*?{':
+            #the char before an optional quantifier is not required.
+            run = run[:-1]
+            if char == '{':
+                #skip the {m,n} bounds.
+                while index < len(log_msg) and log_msg[index] != '}':
+                    index += 1
+                index += 1
+        elif char == '[':
+            #skip the character class.
+            while index < len(log_msg) and log_msg[index] != ']':
+                index += 2 if log_msg[index] == '\\' else 1
+            index += 1
+        elif char not in REGEX_SPECIAL_CHARS:
+            run += char
+            continue
+        runs.append(run)
+        run = ''
+    runs.append(run)
+    #text in groups may be optional.
+    if '(' in log_msg:
+        return None
+    runs = [run for run in runs if run]
+    if not runs:
+        return None
+    #the service and level text following the date is common to most log
+    #lines, so the message text is preferred.
+    return max(runs[1:] or runs, key=len)
+
+
+def compile_task_patterns(task_name_log_map, date_regex):
+    """
+    Return the list of (task, log message, compiled pattern, required text)
+    for the list of (task, log message) with the date regex substituted in
+    each message. The result is cached, so each task list is compiled only
+    once.
+    """
+    key = (tuple(task_name_log_map), date_regex)
+    task_patterns = _task_patterns_cache.get(key)
+    if task_patterns is None:
+        task_patterns = [(task, log_msg, re.compile(log_msg % date_regex),
+                          _fetch_required_literal(log_msg))
+                         for task, log_msg in task_name_log_map]
+        _task_patterns_cache[key] = task_patterns
+    return task_patterns
+
+
+class TaskMatcher(object):
+    """
+    Matches task log messages over the logs of a request.
+
+    The logs are joined once into a single text and the text required by a
+    task pattern is searched in it, so the pattern is only tried on the
+    lines which contain that text.
+    """
+
+    def __init__(self, request_logs):
+        self.request_logs = request_logs
+        self.text = ''.join(request_logs)
+        self.line_offsets = []
+        offset = 0
+        for line in request_logs:
+            self.line_offsets.append(offset)
+            offset += len(line)
+
+    def search(self, pattern, literal, start_index):
+        """
+        Return the index and match object of the first line at or after
+        start_index matching the pattern, or (None, None).
+        """
+        line_count = len(self.request_logs)
+        if not literal:
+            for index in xrange(start_index, line_count):
+                mObj = pattern.search(self.request_logs[index])
+                if mObj:
+                    return index, mObj
+            return None, None
+
+        while start_index < line_count:
+            position = self.text.find(literal,
+                                      self.line_offsets[start_index])
+            if position == -1:
+                break
+            index = bisect.bisect_right(self.line_offsets, position) - 1
+            mObj = pattern.search(self.request_logs[index])
+            if mObj:
+                return index, mObj
+            start_index = index + 1
+        return None, None
+
+
+class RequestLogContext(object):
+    """
+    The log messages of a request, fetched from the log once and shared by
+    all the lookups of the request analysis: the task metrics, the compute
+    host... The timestamps and the hostnames of the messages are parsed when
+    first used and kept with the messages.
+    """
+
+    def __init__(self, request_id, request_logs, date_pattern,
+                 parse_timestamp, clock_offsets=None):
+        self.request_id = request_id
+        self.request_logs = request_logs or []
+        self.date_pattern = date_pattern
+        self.parse_timestamp = parse_timestamp
+        #clock offset of the log source of each message, see
+        #LogAnalyzer.merge_request_logs.
+        self.clock_offsets = clock_offsets
+        #{line index: epoch milliseconds or None}
+        self.timestamps = {}
+        #{line index: hostname or None}
+        self.hostnames = {}
+        #{task: index of the line logging the task}, see fetch_request_metrics
+        self.task_lines = {}
+        self._matcher = None
+
+    def __len__(self):
+        return len(self.request_logs)
+
+    @property
+    def matcher(self):
+        """The TaskMatcher of the messages."""
+        if self._matcher is None:
+            self._matcher = TaskMatcher(self.request_logs)
+        return self._matcher
+
+    def clock_offset(self, index):
+        """Return the clock offset of the source of the message at index."""
+        if self.clock_offsets is None:
+            return 0
+        return self.clock_offsets[index]
+
+    def timestamp(self, index):
+        """
+        Return the epoch milliseconds of the message at index, or None if
+        it has no date field.
+        """
+        index = index % len(self.request_logs)
+        if index not in self.timestamps:
+            timestamp = None
+            mObj = self.date_pattern.search(self.request_logs[index])
+            if mObj:
+                timestamp = self.parse_timestamp(mObj.group('date_time')) + \
+                            self.clock_offset(index)
+            self.timestamps[index] = timestamp
+        return self.timestamps[index]
+
+    def hostname(self, index):
+        """
+        Return the syslog hostname of the message at index, or None.
+        """
+        index = index % len(self.request_logs)
+        if index not in self.hostnames:
+            mObj = SYSLOG_HOSTNAME_REGEX.match(self.request_logs[index])
+            self.hostnames[index] = mObj.group('hostname') if mObj else None
+        return self.hostnames[index]
+
+    def search(self, regex):
+        """Return the first match of regex in the messages."""
+        pattern = re.compile(regex)
+        for line in self.request_logs:
+            mObj = pattern.search(line)
+            if mObj:
+                return mObj
+        return None
+
+
+class RequestLogIndex(object):
+    """
+    Persistent sidecar index of the request ids of a log file.
+
+    Maps each request id to the byte offsets of its log lines and records
+    the offset up to which the log is indexed, so that an update only
+    indexes the bytes appended to the log since the previous one.
+    """
+    #number of index rows inserted at a time.
+    INSERT_BATCH_SIZE = 10000
+
+    def __init__(self, log_filename, index_filename):
+        self.log_filename = log_filename
+        self.index_filename = index_filename
+
+    def _connect(self):
+        #transactions are handled explicitly, see update().
+        conn = sqlite3.connect(self.index_filename,
+                               timeout=LOG_INDEX_LOCK_TIMEOUT,
+                               isolation_level=None)
+        conn.execute("CREATE TABLE IF NOT EXISTS log_lines "
+                     "(request_id TEXT NOT NULL, offset INTEGER NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS log_lines_request_id "
+                     "ON log_lines (request_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS log_state "
+                     "(name TEXT PRIMARY KEY, value TEXT)")
+        return conn
+
+    def _get_state(self, conn, name, default=None):
+        row = conn.execute("SELECT value FROM log_state WHERE name = ?",
+                           (name,)).fetchone()
+        if row is None:
+            return default
+        return row[0]
+
+    def _set_state(self, conn, name, value):
+        conn.execute("INSERT OR REPLACE INTO log_state (name, value) "
+                     "VALUES (?, ?)", (name, value))
+
+    def update(self):
+        """Index the log lines appended since the last update."""
+        conn = self._connect()
+        try:
+            #hold the write lock from reading the indexed offset till commit.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stat = os.stat(self.log_filename)
+                log_id = "%d:%d" % (stat.st_dev, stat.st_ino)
+                offset = int(self._get_state(conn, "offset", 0))
+                if self._get_state(conn, "log_id") != log_id or\
+                   stat.st_size < offset:
+                    #log was rotated or truncated, index it from the start.
+                    conn.execute("DELETE FROM log_lines")
+                    offset = 0
+
+                insert_sql = "INSERT INTO log_lines (request_id, offset) "\
+                             "VALUES (?, ?)"
+                rows = []
+                fp = open(self.log_filename, "rb",
+                          CustomLogParser.READ_BUFFER_SIZE)
+                fp.seek(offset)
+                for line in fp:
+                    #line still being written, index it on the next update.
+                    if not line.endswith("\n"):
+                        break
+                    for request_id in set(REQUEST_ID_REGEX.findall(line)):
+                        rows.append((request_id, offset))
+                    offset += len(line)
+                    if len(rows) >= self.INSERT_BATCH_SIZE:
+                        conn.executemany(insert_sql, rows)
+                        rows = []
+                fp.close()
+                conn.executemany(insert_sql, rows)
+                self._set_state(conn, "log_id", log_id)
+                self._set_state(conn, "offset", str(offset))
+                conn.execute("COMMIT")
+            except:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    def lookup(self, request_id):
+        """Return the byte offsets of the log lines of the request."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute("SELECT offset FROM log_lines WHERE "
+                                  "request_id = ? ORDER BY offset",
+                                  (request_id,))
+            return [row[0] for row in cursor]
+        finally:
+            conn.close()
+
+
 class CustomLogParser(object):
-    def __init__(self, filename):
+    #buffer size used while reading the log file.
+    READ_BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, filename, encoding="utf-8", index_filename=None,
+                 scan_workers=1, time_index=None, time_window=None):
+        #log file or glob pattern of its segments, see log_sources.py.
         self.filename = filename
-        self.data = []
+        self.encoding = encoding
+        #processes scanning the log, 0 for one per core, see
+        #ParallelLogScanner.
+        self.scan_workers = scan_workers
+        #SegmentTimeIndex of the segments and (start, end) timestamps of the
+        #analyzed requests, None for no bound.
+        self.time_index = time_index
+        self.time_window = time_window
+        self.log_index = None
+        #the request id index has the offsets of a single plain log file.
+        if index_filename and \
+           log_sources.fetch_log_segments(filename) == [filename] and \
+           not log_sources.is_compressed(filename):
+            self.log_index = RequestLogIndex(filename, index_filename)
 
-    def __load_log_messages(self):
-        fp = codecs.open(self.filename, "r", "utf-8")
-        self.data = fp.readlines()
-        fp.close()
+    def fetch_segments(self):
+        """
+        Return the segments of the log which may have the lines of the
+        analyzed requests, oldest first.
+        """
+        segments = log_sources.fetch_log_segments(self.filename)
+        if self.time_index and self.time_window and len(segments) > 1:
+            segments = self.time_index.select(segments, self.time_window)
+        return segments
+
+    def _is_log_readable(self):
+        segments = log_sources.fetch_log_segments(self.filename)
+        if segments and all([os.path.exists(segment) and
+                             os.access(segment, os.R_OK)
+                             for segment in segments]):
+            return True
+        print _("Unable to read log file %s") % self.filename
+        return False
+
+    def _iter_log_lines(self, segments=None):
+        """Yield the raw (undecoded) lines of the log segments."""
+        if segments is None:
+            segments = self.fetch_segments()
+        return log_sources.iter_log_lines(segments)
+
+    def _decode(self, line):
+        return line.decode(self.encoding, "replace")
+
+    def _lookup_log_index(self, request_id):
+        """
+        Return the offsets of the request log lines from the log index or
+        None when the index can not be used for this request.
+        """
+        if not self.log_index or not REQUEST_ID_REGEX.match(request_id):
+            return None
+        try:
+            self.log_index.update()
+            return self.log_index.lookup(request_id)
+        except (sqlite3.Error, IOError, OSError), e:
+            print _("Unable to use log index %(index)s: %(error)s") % \
+                  {'index': self.log_index.index_filename, 'error': e}
+            self.log_index = None
+            return None
+
+    def _iter_log_lines_at(self, offsets):
+        """Yield the raw log lines starting at the given offsets."""
+        fp = open(self.filename, "rb")
+        try:
+            for offset in offsets:
+                fp.seek(offset)
+                yield fp.readline()
+        finally:
+            fp.close()
+
+    def iter_request_logs(self, request_id):
+        """
+        Yield the log messages of the request. Only the matching lines are
+        decoded, so the memory used does not depend on the log size.
+        """
+        offsets = self._lookup_log_index(request_id)
+        if offsets is not None:
+            for line in self._iter_log_lines_at(offsets):
+                yield self._decode(line)
+            return
+
+        segments = self.fetch_segments()
+        if self.scan_workers != 1:
+            scanner = ParallelLogScanner(segments, self.scan_workers,
+                                         self.encoding)
+            for line in scanner.fetch_requests_logs([request_id])[request_id]:
+                yield line
+            return
+
+        request_id = request_id.encode(self.encoding)
+        for segment in segments:
+            lines = None
+            if not log_sources.is_compressed(segment):
+                try:
+                    lines = mmap_find_lines(segment, request_id)
+                except (EnvironmentError, ValueError, OverflowError):
+                    #log can not be memory mapped, Eg: empty file or larger
+                    #than the address space.
+                    pass
+            if lines is None:
+                #the segment is read (and decompressed) as a stream.
+                lines = (line for line in
+                         log_sources.iter_segment_lines(segment)
+                         if request_id in line)
+            for line in lines:
+                yield self._decode(line)
 
     def fetch_request_logs(self, request_id):
-        if os.path.exists(self.filename) and os.access(self.filename, os.R_OK):
-            self.__load_log_messages()
-            filtered_logs = []
-            for line in self.data:
-                if line.find(request_id) != -1:
-                    filtered_logs.append(line)
-            self.data = []
-            return filtered_logs
+        if self._is_log_readable():
+            return list(self.iter_request_logs(request_id))
         else:
-            print _("Unable to read log file %s") % self.filename
             return False
 
-    def fetch_regex_value(self, request_id, regex):
-        logs = self.fetch_request_logs(request_id)
-        value = None
-        if logs:
-            for line in logs:
-                mObj = re.search(regex, line)
-                if mObj:
-                    return mObj
+    def fetch_requests_logs(self, request_ids):
+        """
+        Fetch the logs of several requests in a single pass over the log file.
+        Returns a dictionary of request_id and its list of log messages.
+        """
+        if not self._is_log_readable():
+            return False
+        segments = self.fetch_segments()
+        if self.scan_workers != 1:
+            scanner = ParallelLogScanner(segments, self.scan_workers,
+                                         self.encoding)
+            return scanner.fetch_requests_logs(request_ids)
+        return collect_requests_logs(self._iter_log_lines(segments),
+                                     request_ids, self.encoding)
+
+    def fetch_regex_value(self, request_id, regex, logs=None):
+        """Return the first match of regex in the request logs."""
+        if logs is None:
+            if not self._is_log_readable():
+                return None
+            logs = self.iter_request_logs(request_id)
+        for line in logs:
+            mObj = re.search(regex, line)
+            if mObj:
+                return mObj
         return None
 
 
 class LogAnalyzer(object):
-    def __init__(self, file_name, date_regex, date_format):
-        self.log_parser = CustomLogParser(file_name)
+    """
+    Analyzes the request logs of a log source, or of several log sources
+    (Eg: the logs of the Nova services on separate hosts, see
+    add_log_source) whose request logs are merged in timestamp order.
+    """
+
+    def __init__(self, file_name, date_regex, date_format,
+                 index_filename=None, scan_workers=1, time_window=None,
+                 segment_index_filename=None, clock_offset=0):
         self.date_regex = date_regex
+        self.date_pattern = re.compile(date_regex)
         self.date_format = date_format
+        self.parse_timestamp = fetch_timestamp_parser(date_format)
+        self.scan_workers = scan_workers
+        #(since, until) log timestamps of the analyzed requests.
+        if time_window:
+            time_window = tuple([value and self.parse_timestamp(value)
+                                 for value in time_window])
+        self.time_window = time_window
+        #list of (CustomLogParser, clock offset) of the log sources.
+        self.log_sources = []
+        self.add_log_source(file_name, index_filename, segment_index_filename,
+                            clock_offset)
+        self.log_parser = self.log_sources[0][0]
+
+    def add_log_source(self, file_name, index_filename=None,
+                       segment_index_filename=None, clock_offset=0):
+        """
+        Add a log source, the clock offset (milliseconds) is added to its
+        timestamps.
+        """
+        time_index = log_sources.SegmentTimeIndex(self.parse_line_timestamp,
+                                                  segment_index_filename)
+        time_window = self.time_window
+        if time_window:
+            #the window is in the clock of the other sources.
+            time_window = tuple([value and value - clock_offset
+                                 for value in time_window])
+        log_parser = CustomLogParser(file_name,
+                                     index_filename=index_filename,
+                                     scan_workers=self.scan_workers,
+                                     time_index=time_index,
+                                     time_window=time_window)
+        self.log_sources.append((log_parser, clock_offset))
+
+    def parse_line_timestamp(self, line):
+        """Return the timestamp of the log line, None if it has no date."""
+        mObj = self.date_pattern.search(line)
+        if mObj:
+            return self.parse_timestamp(mObj.group('date_time'))
+        return None
+
+    def _iter_timestamped_logs(self, number, request_logs, clock_offset):
+        """
+        Yield the (timestamp, source number, line number, message, clock
+        offset) of the request logs of a source. A message without date
+        has the timestamp of the previous message.
+        """
+        timestamp = None
+        for line_number, line in enumerate(request_logs):
+            line_timestamp = self.parse_line_timestamp(line)
+            if line_timestamp is not None:
+                timestamp = line_timestamp + clock_offset
+            yield timestamp, number, line_number, line, clock_offset
+
+    def merge_request_logs(self, request_id, sources_logs):
+        """
+        Return the RequestLogContext of the request logs of several sources,
+        a list of (request logs, clock offset). The logs of each source are
+        in timestamp order, they are merged lazily in a heap of one message
+        per source.
+        """
+        streams = [self._iter_timestamped_logs(number, request_logs,
+                                               clock_offset)
+                   for number, (request_logs, clock_offset) in
+                   enumerate(sources_logs) if request_logs]
+        request_logs = []
+        clock_offsets = []
+        for timestamp, number, line_number, line, clock_offset in \
+                heapq.merge(*streams):
+            request_logs.append(line)
+            clock_offsets.append(clock_offset)
+        return RequestLogContext(request_id, request_logs, self.date_pattern,
+                                 self.parse_timestamp, clock_offsets)
+
+    def fetch_request_context(self, request_id, request_logs=None):
+        """
+        Return the RequestLogContext of the request, the logs are fetched
+        from the log sources unless the caller already fetched them.
+        """
+        if request_logs is None and len(self.log_sources) > 1:
+            sources_logs = []
+            for log_parser, clock_offset in self.log_sources:
+                if log_parser._is_log_readable():
+                    sources_logs.append((log_parser.iter_request_logs(
+                                                request_id), clock_offset))
+            return self.merge_request_logs(request_id, sources_logs)
+        if request_logs is None:
+            request_logs = self.log_parser.fetch_request_logs(request_id)
+        clock_offset = self.log_sources[0][1]
+        if request_logs and clock_offset:
+            return self.merge_request_logs(request_id,
+                                           [(request_logs, clock_offset)])
+        return RequestLogContext(request_id, request_logs, self.date_pattern,
+                                 self.parse_timestamp)
+
+    def fetch_requests_contexts(self, request_ids):
+        """
+        Return the {request id: RequestLogContext} of the requests, each log
+        source is read once for all the requests. Returns False if a log
+        source can not be read.
+        """
+        sources_logs = []
+        for log_parser, clock_offset in self.log_sources:
+            request_logs = log_parser.fetch_requests_logs(request_ids)
+            if request_logs is False:
+                return False
+            sources_logs.append((request_logs, clock_offset))
+        contexts = {}
+        for request_id in request_ids:
+            if len(sources_logs) == 1 and not sources_logs[0][1]:
+                contexts[request_id] = RequestLogContext(request_id,
+                        sources_logs[0][0][request_id], self.date_pattern,
+                        self.parse_timestamp)
+            else:
+                contexts[request_id] = self.merge_request_logs(request_id,
+                        [(request_logs[request_id], clock_offset)
+                         for request_logs, clock_offset in sources_logs])
+        return contexts
 
     def fetch_request_metrics(self, request_id, task_name_log_map,
-                              timedelta_convertor=None):
+                              timedelta_convertor=None, request_logs=None,
+                              context=None):
         """Fetch the request logs and calculate metrics"""
         metrics = {}
 
-        request_logs = self.log_parser.fetch_request_logs(request_id)
-        if request_logs:
+        if context is None:
+            context = self.fetch_request_context(request_id, request_logs)
+        if len(context):
             if not timedelta_convertor:
                 timedelta_convertor = convert_timedelta_to_milliseconds
 
-            mObj = re.search(self.date_regex, request_logs[0])
-            if not mObj:
+            start_time = context.timestamp(0)
+            if start_time is None:
                 print _("Date field not available in log message. Please"\
                         "check the date format in configuration.")
                 return metrics
-            start_time = datetime.strptime(mObj.group('date_time'),
-                                           self.date_format)
-
-            mObj = re.search(self.date_regex, request_logs[-1])
-            end_time = datetime.strptime(mObj.group('date_time'),
-                                         self.date_format)
+            end_time = context.timestamp(-1)
 
             task_time = {}
             last_time = start_time
             start_index = 0
-            for task, log_msg in task_name_log_map:
-                found = False
-                for index in range(start_index, len(request_logs)):
-                    mObj = re.search(log_msg % self.date_regex,
-                                     request_logs[index])
-                    if mObj:
-                        #log found.
-                        current_time = datetime.strptime(
-                            mObj.group('date_time'), self.date_format)
-                        time_taken = current_time - last_time
-                        last_time = current_time
-                        task_time[task] = timedelta_convertor(time_taken)
-                        found = True
-                        start_index = index
-                        break
-                if not found:
+            task_patterns = compile_task_patterns(task_name_log_map,
+                                                  self.date_regex)
+            matcher = context.matcher
+            for task, log_msg, pattern, literal in task_patterns:
+                #each task is logged at or after the previous task.
+                index, mObj = matcher.search(pattern, literal, start_index)
+                if mObj:
+                    #log found.
+                    current_time = self.parse_timestamp(
+                                            mObj.group('date_time')) + \
+                                   context.clock_offset(index)
+                    time_taken = current_time - last_time
+                    last_time = current_time
+                    task_time[task] = timedelta_convertor(time_taken)
+                    start_index = index
+                    context.task_lines[task] = index
+                else:
                     print _("Expected log message '%(log_msg)s' not found "\
                         "for request %(request_id)s") % locals()
                     task_time[task] = 0
@@ -117,15 +936,49 @@ class LogAnalyzer(object):
 
 
 class PerfResultsLogger(object):
-    def __init__(self, format, filename):
+    """
+    Logs the results records to a csv file, or to a columnar file when the
+    format is 'col' (see columnar_store.py).
+
+    Up to buffer_size records are kept in memory and appended to the file at
+    once, under an exclusive lock of the file, so the rows of concurrent
+    writers do not interleave and the field names are written only once.
+    """
+
+    def __init__(self, format, filename, buffer_size=1):
         self.format = format
         self.filename = filename
+        self.buffer_size = buffer_size
+        self.fields = None
+        self.rows = []
 
-    def _emit(self, results_list):
-        fp = open(self.filename, "a")
-        writer = csv.writer(fp)
-        writer.writerows(results_list)
-        fp.close()
+    def _emit(self, fields, results_list):
+        if self.format == 'col':
+            #each columnar row group has its own schema header.
+            data = columnar_store.encode_row_group(fields, results_list)
+        else:
+            buf = StringIO()
+            writer = csv.writer(buf)
+            writer.writerows(results_list)
+            data = buf.getvalue()
+        fp = open(self.filename, "ab")
+        try:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+            #checked under the lock, another writer may have just created it.
+            fp.seek(0, os.SEEK_END)
+            if fp.tell() == 0 and self.format != 'col':
+                #write the field names first.
+                csv.writer(fp).writerow(fields)
+            fp.write(data)
+        finally:
+            #closing the file releases the lock.
+            fp.close()
+
+    def flush(self):
+        """Write the buffered results to the file."""
+        if self.rows:
+            self._emit(self.fields, self.rows)
+            self.rows = []
 
     def log_results(self, fields, results_list):
         """
@@ -133,19 +986,103 @@ class PerfResultsLogger(object):
         params: fields - list (order in which fields are written to csv)
         params: results_list - list containing dictionary of results per api
         """
-        log_result_list = []
-        #write the field names first.
-        if not os.path.exists(self.filename):
-            log_result_list.append(fields)
+        if fields != self.fields:
+            self.flush()
+            self.fields = list(fields)
 
         for result in results_list:
             result_list = []
             #preserve the order in which fields are written to csv.
             for field in fields:
                 result_list.append(result[field])
-            log_result_list.append(result_list)
-        if log_result_list:
-            self._emit(log_result_list)
+            self.rows.append(result_list)
+        if len(self.rows) >= self.buffer_size:
+            self.flush()
+
+
+class AnalysisJobQueue(object):
+    """
+    Durable queue of the requests waiting to be analyzed.
+
+    The jobs are kept in a SQLite file, so they may be queued by many
+    processes at once and are not lost if the process draining the queue
+    is stopped; the jobs it was running are queued again by recover().
+    """
+    QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+    def __init__(self, queue_filename):
+        self.queue_filename = queue_filename
+        ensure_dir(os.path.dirname(os.path.abspath(queue_filename)))
+
+    def _connect(self):
+        #transactions are handled explicitly, see claim().
+        conn = sqlite3.connect(self.queue_filename,
+                               timeout=LOG_INDEX_LOCK_TIMEOUT,
+                               isolation_level=None)
+        conn.execute("CREATE TABLE IF NOT EXISTS jobs "
+                     "(id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "params TEXT NOT NULL, state TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+        return conn
+
+    def put(self, params):
+        """Queue the analysis request parameters, returns the job id."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute("INSERT INTO jobs (params, state) "
+                                  "VALUES (?, ?)",
+                                  (json.dumps(params), self.QUEUED))
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def claim(self, limit):
+        """Return up to limit queued (job id, params) marked as running."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute("SELECT id, params FROM jobs WHERE "
+                                    "state = ? ORDER BY id LIMIT ?",
+                                    (self.QUEUED, limit)).fetchall()
+                conn.executemany("UPDATE jobs SET state = ? WHERE id = ?",
+                                 [(self.RUNNING, row[0]) for row in rows])
+                conn.execute("COMMIT")
+            except:
+                conn.execute("ROLLBACK")
+                raise
+            return [(job_id, json.loads(params)) for job_id, params in rows]
+        finally:
+            conn.close()
+
+    def finish(self, job_id, failed=False):
+        """Mark the running job as done or failed."""
+        state = self.FAILED if failed else self.DONE
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE jobs SET state = ? WHERE id = ?",
+                         (state, job_id))
+        finally:
+            conn.close()
+
+    def recover(self):
+        """Queue again the jobs left running by a stopped drain."""
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE jobs SET state = ? WHERE state = ?",
+                         (self.QUEUED, self.RUNNING))
+        finally:
+            conn.close()
+
+    def pending(self):
+        """Return the count of the queued and running jobs."""
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE state IN "
+                                "(?, ?)",
+                                (self.QUEUED, self.RUNNING)).fetchone()[0]
+        finally:
+            conn.close()
 
 
 class PerfAnalyzerConfig(object):
@@ -172,7 +1109,58 @@ class PerfAnalyzerConfig(object):
         """Results file name prefix to use"""
         return self.get("result_file_prefix", 'nova_api')
 
+    @property
+    def result_file_format(self):
+        """Results file format, csv or col (columnar)"""
+        return self.get("result_file_format", 'csv')
+
     @property
     def result_file_dir(self):
         """Results file to create in this directory """
         return self.get("result_file_dir", os.getcwd())
+
+    def get_log_index_filename(self, log_name):
+        """Request id index file of the log"""
+        index_dir = self.get("log_index_dir", None) or\
+                    os.path.dirname(os.path.abspath(log_name))
+        return os.path.join(index_dir, os.path.basename(log_name) + ".reqidx")
+
+    def get_segment_index_filename(self, log_name):
+        """Time index of the segments of the log, see log_sources.py"""
+        index_dir = self.get("log_index_dir", None) or\
+                    os.path.dirname(os.path.abspath(log_name))
+        return os.path.join(index_dir, re.sub('[*?[\]]', '_',
+                            os.path.basename(log_name)) + ".segidx")
+
+    @property
+    def log_time_window(self):
+        """(since, until) log timestamps of the analyzed requests, or None"""
+        since = self.get("log_since", None) or None
+        until = self.get("log_until", None) or None
+        if since or until:
+            return since, until
+        return None
+
+    def get_job_queue_filename(self):
+        """Analysis job queue file, in the results file dir"""
+        return os.path.join(self.result_file_dir, "analysis_jobs.db")
+
+    @property
+    def analyzer_workers(self):
+        """Number of processes analyzing the queued requests"""
+        return int(self.get("analyzer_workers", 4))
+
+    @property
+    def log_scan_workers(self):
+        """Number of processes scanning the log, 0 for one per core"""
+        return int(self.get("log_scan_workers", 1))
+
+    @property
+    def live_request_timeout(self):
+        """Seconds an unfinished request is followed in live mode"""
+        return int(self.get("live_request_timeout", 600))
+
+    @property
+    def live_max_requests(self):
+        """Number of unfinished requests followed in live mode"""
+        return int(self.get("live_max_requests", 10000))